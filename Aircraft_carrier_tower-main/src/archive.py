@@ -0,0 +1,275 @@
+import os
+import lzma
+import zlib
+import queue
+import struct
+import threading
+import numpy as np
+
+
+# 文件头: 魔数 + 版本 + 压缩算法 + 传感器列数
+FILE_MAGIC = b'TLMARC1\0'
+FILE_HEADER = struct.Struct('<8sBBH')
+# 数据块头: 魔数 + 帧数 + 起止时间 + 压缩后长度
+CHUNK_MAGIC = b'CHNK'
+CHUNK_HEADER = struct.Struct('<4sIddI')
+# 尾部索引项: 起止时间 + 数据块偏移 + 压缩后长度 + 帧数
+INDEX_ENTRY = struct.Struct('<ddQII')
+# 文件尾: 索引偏移 + 索引项数 + 魔数
+FOOTER_MAGIC = b'TLMIDX\0\0'
+FOOTER = struct.Struct('<QI8s')
+
+CODECS = {'zlib': 0, 'lzma': 1}
+CODEC_NAMES = {v: k for k, v in CODECS.items()}
+VERSION = 1
+GYRO_COUNT = 9
+
+
+def _shuffle(column):
+    """按字节平面重排（所有元素的第0字节、第1字节...），浮点数据压缩率明显提高"""
+    column = np.ascontiguousarray(column)
+    return column.view(np.uint8).reshape(len(column), column.itemsize).T.tobytes()
+
+
+def _unshuffle(data, dtype, n):
+    """_shuffle的逆操作"""
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, n)
+    return np.ascontiguousarray(planes.T).view(dtype).reshape(n)
+
+
+class TelemetryArchiveWriter:
+    """
+    遥测归档写入器 - 按帧数或时间切分为独立压缩的数据块，文件尾写入时间索引
+    write只把数据追加到缓存，压缩和写文件在单独的写入线程中进行，不阻塞调用方（串口线程）
+    """
+
+    def __init__(self, path, codec='zlib', level=6, chunk_frames=4096, chunk_seconds=10.0):
+        """
+        Args:
+            path: str 归档文件路径
+            codec: str 压缩算法 'zlib' 或 'lzma'
+            level: int 压缩级别
+            chunk_frames: int 每个数据块的最大帧数
+            chunk_seconds: float 每个数据块的最大时间跨度，单位秒
+        """
+        if codec not in CODECS:
+            raise ValueError(f"不支持的压缩算法: {codec}")
+        self.path = path
+        self.codec = codec
+        self.level = level
+        self.chunk_frames = chunk_frames
+        self.chunk_seconds = chunk_seconds
+
+        self.file = open(path, 'wb')
+        self.file.write(FILE_HEADER.pack(FILE_MAGIC, VERSION, CODECS[codec], GYRO_COUNT))
+        self.index = []
+        self.pending = []
+        self.pending_frames = 0
+        self.pending_start = None
+        # 已封装、等待写入线程压缩的帧数
+        self.queued_frames = 0
+        self.frame_count = 0
+        self.raw_bytes = 0
+        self.file_size = self.file.tell()
+        self.lock = threading.Lock()
+        self.closed = False
+
+        # 写入线程：从队列取出封装好的数据块，压缩并写入文件，None表示结束
+        self.chunk_queue = queue.Queue()
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def write(self, times, values):
+        """
+        追加一批遥测数据，可直接作为DecimationStage的record_sink
+        Args:
+            times: np.ndarray (n,) Unix时间戳
+            values: np.ndarray (n, 10) 列顺序为 last_switch + 9个传感器值
+        """
+        if len(times) == 0:
+            return
+        with self.lock:
+            if self.closed:
+                return
+            if self.pending_start is None:
+                self.pending_start = times[0]
+            self.pending.append((np.asarray(times, dtype=np.float64),
+                                 np.asarray(values)))
+            self.pending_frames += len(times)
+            if (self.pending_frames >= self.chunk_frames or
+                    times[-1] - self.pending_start >= self.chunk_seconds):
+                self._seal_chunk()
+
+    def _seal_chunk(self):
+        """把缓存的数据交给写入线程（调用方持有lock）"""
+        if not self.pending_frames:
+            return
+        self.chunk_queue.put(self.pending)
+        self.queued_frames += self.pending_frames
+        self.pending = []
+        self.pending_frames = 0
+        self.pending_start = None
+
+    def _compress(self, payload):
+        if self.codec == 'lzma':
+            return lzma.compress(payload, preset=self.level)
+        return zlib.compress(payload, self.level)
+
+    def _writer(self):
+        """写入线程主循环"""
+        while True:
+            batches = self.chunk_queue.get()
+            if batches is None:
+                return
+            try:
+                self._write_chunk(batches)
+            except Exception as e:
+                print(f"归档写入错误: {e}")
+
+    def _write_chunk(self, batches):
+        """把一组数据压缩为一个数据块写入文件"""
+        t = np.concatenate([batch[0] for batch in batches])
+        values = np.concatenate([batch[1] for batch in batches])
+        n = len(t)
+
+        # 列式存储：时间、开关状态、9列传感器数据
+        parts = [_shuffle(t), values[:, 0].astype(np.uint8).tobytes()]
+        gyro = values[:, 1:1 + GYRO_COUNT].astype(np.float32)
+        parts.extend(_shuffle(gyro[:, i]) for i in range(GYRO_COUNT))
+        payload = b''.join(parts)
+        compressed = self._compress(payload)
+
+        # 文件只由写入线程写，close在写入线程结束后才写索引
+        offset = self.file.tell()
+        t_start, t_end = float(t.min()), float(t.max())
+        self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, n, t_start, t_end, len(compressed)))
+        self.file.write(compressed)
+
+        with self.lock:
+            self.index.append((t_start, t_end, offset, len(compressed), n))
+            self.frame_count += n
+            self.queued_frames -= n
+            self.raw_bytes += len(payload)
+            self.file_size = self.file.tell()
+
+    def close(self):
+        """写出剩余数据和尾部索引，关闭文件（等待写入线程处理完队列）"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._seal_chunk()
+        self.chunk_queue.put(None)
+        self.thread.join()
+
+        index_offset = self.file.tell()
+        for entry in self.index:
+            self.file.write(INDEX_ENTRY.pack(*entry))
+        self.file.write(FOOTER.pack(index_offset, len(self.index), FOOTER_MAGIC))
+        self.file.close()
+        self.file_size = os.path.getsize(self.path)
+
+    def stats(self):
+        """返回 (帧数（含未写入的缓存）, 数据块数, 已写入数据块的原始字节数, 文件字节数)"""
+        with self.lock:
+            frames = self.frame_count + self.queued_frames + self.pending_frames
+            return frames, len(self.index), self.raw_bytes, self.file_size
+
+
+class TelemetryArchiveReader:
+    """遥测归档读取器 - 按时间窗口只解压有重叠的数据块"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        magic, version, codec, gyro_count = FILE_HEADER.unpack(self.file.read(FILE_HEADER.size))
+        if magic != FILE_MAGIC:
+            self.file.close()
+            raise ValueError(f"不是遥测归档文件: {path}")
+        if version != VERSION or gyro_count != GYRO_COUNT:
+            self.file.close()
+            raise ValueError(f"不支持的归档版本: {version}")
+        self.codec = CODEC_NAMES[codec]
+        # 尾部索引缺失（写入时异常中断）则逐块扫描重建
+        self.recovered = False
+        entries = self._read_footer_index()
+        if entries is None:
+            entries = self._scan_index()
+            self.recovered = True
+        self.index = np.array(entries, dtype=[('t_start', 'f8'), ('t_end', 'f8'),
+                                               ('offset', 'u8'), ('length', 'u4'), ('frames', 'u4')])
+
+    def _read_footer_index(self):
+        size = os.path.getsize(self.path)
+        if size < FILE_HEADER.size + FOOTER.size:
+            return None
+        self.file.seek(size - FOOTER.size)
+        index_offset, count, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+        if magic != FOOTER_MAGIC or index_offset + count * INDEX_ENTRY.size != size - FOOTER.size:
+            return None
+        self.file.seek(index_offset)
+        raw = self.file.read(count * INDEX_ENTRY.size)
+        return [INDEX_ENTRY.unpack_from(raw, i * INDEX_ENTRY.size) for i in range(count)]
+
+    def _scan_index(self):
+        entries = []
+        offset = FILE_HEADER.size
+        size = os.path.getsize(self.path)
+        while offset + CHUNK_HEADER.size <= size:
+            self.file.seek(offset)
+            magic, n, t_start, t_end, length = CHUNK_HEADER.unpack(self.file.read(CHUNK_HEADER.size))
+            if magic != CHUNK_MAGIC or offset + CHUNK_HEADER.size + length > size:
+                break
+            entries.append((t_start, t_end, offset, length, n))
+            offset += CHUNK_HEADER.size + length
+        return entries
+
+    def _read_chunk(self, entry):
+        """解压一个数据块，返回 (t, last_switch, gyro)"""
+        self.file.seek(int(entry['offset']) + CHUNK_HEADER.size)
+        compressed = self.file.read(int(entry['length']))
+        if self.codec == 'lzma':
+            payload = lzma.decompress(compressed)
+        else:
+            payload = zlib.decompress(compressed)
+
+        n = int(entry['frames'])
+        t = _unshuffle(payload[:8 * n], np.float64, n)
+        pos = 8 * n
+        last_switch = np.frombuffer(payload, dtype=np.uint8, count=n, offset=pos).copy()
+        pos += n
+        gyro = np.empty((n, GYRO_COUNT), dtype=np.float32)
+        for i in range(GYRO_COUNT):
+            gyro[:, i] = _unshuffle(payload[pos:pos + 4 * n], np.float32, n)
+            pos += 4 * n
+        return t, last_switch, gyro
+
+    def time_range(self):
+        """返回归档覆盖的 (起始时间, 结束时间)，空归档返回None"""
+        if len(self.index) == 0:
+            return None
+        return float(self.index['t_start'].min()), float(self.index['t_end'].max())
+
+    def read(self, t0=None, t1=None):
+        """
+        读取时间窗口 [t0, t1] 内的数据，None表示不限
+        Returns:
+            tuple: (t, last_switch, gyro)
+        """
+        t0 = -np.inf if t0 is None else t0
+        t1 = np.inf if t1 is None else t1
+        selected = self.index[(self.index['t_end'] >= t0) & (self.index['t_start'] <= t1)]
+
+        parts = [self._read_chunk(entry) for entry in selected]
+        if not parts:
+            return (np.empty(0), np.empty(0, dtype=np.uint8),
+                    np.empty((0, GYRO_COUNT), dtype=np.float32))
+        t = np.concatenate([p[0] for p in parts])
+        last_switch = np.concatenate([p[1] for p in parts])
+        gyro = np.concatenate([p[2] for p in parts])
+        mask = (t >= t0) & (t <= t1)
+        return t[mask], last_switch[mask], gyro[mask]
+
+    def close(self):
+        self.file.close()
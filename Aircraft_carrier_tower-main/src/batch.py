@@ -0,0 +1,455 @@
+"""
+离线批量处理接收日志
+
+用法:
+    python src/batch.py <日志文件、归档文件或目录>... [-o 输出目录] [-j 进程数]
+
+会话来源有两种:
+    接收日志（receive_log.txt格式）: 原始十六进制数据拼接成字节流后用向量化
+        解码器解析；已解码的数据行（逐帧记录或降采样后的“N帧均值”记录）直接解析
+        数值，均值记录作为一行、权重为其帧数。日志中同时有已解码数据行时，原始
+        数据只是不连续的片段（如跨读取的不完整数据包），按段解码且不统计重同步
+        （摘要中raw_contiguous为false，重同步错误和跳过字节为null）
+    遥测归档（.tla，archive start生成）: 全速率逐帧数据
+每个会话输出:
+    <会话名>.npz   列式数据: t, last_switch, gyro(n, 9), count(n,) 每行代表的帧数
+    <会话名>.json  会话摘要: 帧数、重同步错误、IMU统计、时间间隙
+所有会话汇总到 report.json 和 report.csv。
+"""
+import os
+import re
+import sys
+import csv
+import json
+import glob
+import time
+import datetime
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from protocol import Protocol
+from archive import TelemetryArchiveReader
+
+# 日志中的原始数据行: [时间] 接收原始数据 [序号]: 十六进制
+RAW_LINE = re.compile(r'^\[([^\]]+)\] 接收原始数据 \[\d+\]: ([0-9A-Fa-f]*)\s*$')
+# 日志中的已解码数据行: [时间] 接收数据 [序号]: 内容
+DECODED_LINE = re.compile(r'^\[([^\]]+)\] 接收数据 \[\d+\]: (.*)$')
+# 逐帧记录的数据包字典: {'last_switch': 1, 'gyro_data': {'gx': 0.1, ...}}
+NUMBER = r'(-?(?:\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|nan|inf))'
+PACKET = re.compile(r"'last_switch': (\d+), 'gyro_data': \{"
+                    + ", ".join(f"'{name}': {NUMBER}" for name in Protocol().GYRO_FIELDS) + r"\}")
+# 降采样后的均值记录: N帧均值 last_switch=1.000, gx=0.100, ...[, 丢弃字节=N]
+MEAN_RECORD = re.compile(r'^(\d+)帧均值 (.*)$')
+# 实时解析丢弃字节的汇总行: [时间] 丢弃未解析数据 [序号]: N字节
+DISCARD_LINE = re.compile(r'^\[[^\]]+\] 丢弃未解析数据 \[\d+\]: (\d+)字节')
+DISCARD_KEY = '丢弃字节'
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+ARCHIVE_SUFFIX = '.tla'
+
+
+def discover_sessions(paths, patterns):
+    """查找会话日志和归档文件，目录会被递归搜索
+    Args:
+        paths: list 文件或目录路径
+        patterns: list 目录中匹配文件名的通配符
+    Returns:
+        list: 去重后的文件路径，按文件大小降序（大文件先处理，负载更均衡）
+    """
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in patterns:
+                for file_path in glob.glob(os.path.join(path, '**', pattern), recursive=True):
+                    if os.path.isfile(file_path):
+                        found.add(os.path.abspath(file_path))
+        elif os.path.isfile(path):
+            found.add(os.path.abspath(path))
+        else:
+            print(f"路径不存在: {path}")
+    return sorted(found, key=lambda p: (-os.path.getsize(p), p))
+
+
+def session_names(files):
+    """为每个会话生成唯一的输出文件名"""
+    names = []
+    used = set()
+    for path in files:
+        base = os.path.splitext(os.path.basename(path))[0]
+        name, n = base, 1
+        while name in used:
+            n += 1
+            name = f"{base}_{n}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def _parse_time(stamp, cache):
+    """解析日志时间戳，带缓存（同一秒内的行很多）"""
+    if stamp not in cache:
+        try:
+            cache[stamp] = datetime.datetime.strptime(stamp, TIME_FORMAT).timestamp()
+        except ValueError:
+            cache[stamp] = np.nan
+    return cache[stamp]
+
+
+def parse_decoded_line(text, columns):
+    """解析已解码数据行的内容
+    Args:
+        text: str 行内容（序号之后的部分）
+        columns: list 均值记录中的列名顺序（DOWN_FIELDS）
+    Returns:
+        tuple: ([(数据行, 帧数)], 丢弃字节数)，数据行列顺序与columns一致；无法解析时列表为空
+    """
+    match = MEAN_RECORD.match(text)
+    if match:
+        values = dict(item.split('=', 1) for item in match.group(2).split(', ') if '=' in item)
+        discarded = int(values.get(DISCARD_KEY, 0))
+        try:
+            row = [float(values[name]) for name in columns]
+        except (KeyError, ValueError):
+            return [], discarded
+        return [(row, int(match.group(1)))], discarded
+    return [([float(v) for v in packet], 1) for packet in PACKET.findall(text)], 0
+
+
+def read_session(path):
+    """读取会话日志
+    实时程序只在一次读取没有解析出数据包时才记录原始数据，两条原始数据行之间
+    若有已解码数据行，中间的字节没有记录。原始数据按已解码数据行分段，段内连续
+    Returns:
+        tuple: (data, chunk_ends, chunk_times, chunk_segments, decoded)
+            data: bytes 拼接后的原始字节流
+            chunk_ends: np.ndarray 每个数据块在字节流中的结束偏移
+            chunk_times: np.ndarray 每个数据块的接收时间（Unix时间戳）
+            chunk_segments: np.ndarray 每个数据块所属的连续段编号
+            decoded: tuple (t, rows, counts, lines, discarded) 已解码数据行解析出的数据，
+                rows列顺序为DOWN_FIELDS，counts为每行代表的帧数，lines为已解码行数，
+                discarded为日志中记录的实时解析丢弃字节数
+    """
+    columns = Protocol().DOWN_FIELDS
+    hex_chunks = []
+    times = []
+    decoded_t = []
+    decoded_rows = []
+    decoded_counts = []
+    decoded_lines = 0
+    discarded = 0
+    segments = []
+    segment = 0
+    time_cache = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            match = RAW_LINE.match(line)
+            if match:
+                stamp, hex_data = match.groups()
+                if len(hex_data) % 2:
+                    continue
+                hex_chunks.append(hex_data)
+                times.append(_parse_time(stamp, time_cache))
+                segments.append(segment)
+                continue
+            match = DECODED_LINE.match(line)
+            if match:
+                decoded_lines += 1
+                # 已解码的数据没有原始字节，之后的原始数据与之前的不连续
+                if segments and segments[-1] == segment:
+                    segment += 1
+                stamp = _parse_time(match.group(1), time_cache)
+                parsed, line_discarded = parse_decoded_line(match.group(2).rstrip(), columns)
+                discarded += line_discarded
+                for row, count in parsed:
+                    decoded_t.append(stamp)
+                    decoded_rows.append(row)
+                    decoded_counts.append(count)
+                continue
+            match = DISCARD_LINE.match(line)
+            if match:
+                discarded += int(match.group(1))
+
+    data = bytes.fromhex(''.join(hex_chunks))
+    chunk_ends = np.cumsum([len(h) // 2 for h in hex_chunks], dtype=np.int64)
+    decoded = (np.array(decoded_t, dtype=np.float64),
+               np.array(decoded_rows, dtype=np.float64).reshape(-1, len(columns)),
+               np.array(decoded_counts, dtype=np.int64),
+               decoded_lines, discarded)
+    return (data, chunk_ends, np.array(times, dtype=np.float64),
+            np.array(segments, dtype=np.int64), decoded)
+
+
+def decode_segments(protocol, data, chunk_ends, chunk_segments):
+    """
+    按连续段分别解码原始字节流，数据包不会跨越两段之间未记录的数据
+    Returns:
+        tuple: (frames, starts, unframed_bytes)
+            starts为每帧在整个字节流中的偏移，unframed_bytes为不属于任何数据包的字节数
+    """
+    chunk_starts = np.concatenate([[0], chunk_ends[:-1]]).astype(np.int64)
+    bounds = []
+    for segment in np.unique(chunk_segments):
+        index = np.flatnonzero(chunk_segments == segment)
+        bounds.append((int(chunk_starts[index[0]]), int(chunk_ends[index[-1]])))
+    if not bounds:
+        bounds = [(0, len(data))]
+
+    all_frames = []
+    all_starts = []
+    for begin, end in bounds:
+        frames, starts = protocol.decode_down_frames(data[begin:end])
+        all_frames.append(frames)
+        all_starts.append(starts + begin)
+    frames = np.concatenate(all_frames)
+    starts = np.concatenate(all_starts).astype(np.int64)
+    return frames, starts, len(data) - len(frames) * protocol.DOWN_FRAME_SZ
+
+
+def read_archive(path):
+    """读取遥测归档的全部数据
+    Returns:
+        tuple: (t, last_switch, gyro)
+    """
+    reader = TelemetryArchiveReader(path)
+    try:
+        return reader.read()
+    finally:
+        reader.close()
+
+
+def imu_stats(gyro, counts, fields):
+    """按帧数加权的IMU统计（均值记录的min/max为周期均值的极值）"""
+    imu = {}
+    for i, field in enumerate(fields):
+        column = gyro[:, i]
+        finite = np.isfinite(column)
+        if not finite.any():
+            imu[field] = None
+            continue
+        values, weights = column[finite], counts[finite]
+        mean = np.average(values, weights=weights)
+        imu[field] = {
+            'mean': float(mean),
+            'std': float(np.sqrt(np.average((values - mean) ** 2, weights=weights))),
+            'min': float(values.min()), 'max': float(values.max()),
+        }
+    return imu
+
+
+def process_session(path, out_dir, name, gap_threshold, crc_mode=None):
+    """处理单个会话（在工作进程中运行）
+    Returns:
+        dict: 会话摘要
+    """
+    started = time.perf_counter()
+    protocol = Protocol()
+    protocol.set_crc_mode(crc_mode)
+    size = protocol.DOWN_FRAME_SZ
+
+    if path.lower().endswith(ARCHIVE_SUFFIX):
+        source = 'archive'
+        t, last_switch, gyro = read_archive(path)
+        gyro = gyro.astype(np.float64)
+        counts = np.ones(len(t), dtype=np.int64)
+        data, chunk_ends, chunk_times = b'', np.empty(0, dtype=np.int64), np.empty(0)
+        starts = np.empty(0, dtype=np.int64)
+        raw_frames, decoded_lines, decoded_rows, decoded_frames = 0, 0, 0, 0
+        logged_discarded = 0
+        raw_contiguous = True
+    else:
+        source = 'log'
+        data, chunk_ends, chunk_times, chunk_segments, decoded = read_session(path)
+        # 没有已解码数据行时原始数据覆盖了完整的数据流，否则只是不连续的片段
+        raw_contiguous = decoded[3] == 0
+        if raw_contiguous:
+            frames, starts = protocol.decode_down_frames(data)
+        else:
+            frames, starts, unframed_bytes = decode_segments(protocol, data, chunk_ends, chunk_segments)
+        raw_frames = len(frames)
+
+        # 每帧的时间取其最后一个字节所在数据块的接收时间
+        if raw_frames:
+            chunk_index = np.searchsorted(chunk_ends, starts + size - 1, side='right')
+            raw_t = chunk_times[chunk_index]
+        else:
+            raw_t = np.empty(0, dtype=np.float64)
+        # 误接受的伪帧可能含有signaling NaN，转换时不报警
+        with np.errstate(invalid='ignore'):
+            raw_gyro = frames['gyro'].astype(np.float64)
+
+        # 合并原始数据帧与已解码数据行，按时间排序（同一时刻保持日志顺序）
+        decoded_t, rows, decoded_counts, decoded_lines, logged_discarded = decoded
+        decoded_rows = len(rows)
+        decoded_frames = int(decoded_counts.sum())
+        t = np.concatenate([raw_t, decoded_t])
+        last_switch = np.concatenate([frames['last_switch'],
+                                      np.nan_to_num(rows[:, 0]).astype(np.uint8)])
+        gyro = np.concatenate([raw_gyro, rows[:, 1:]])
+        counts = np.concatenate([np.ones(raw_frames, dtype=np.int64), decoded_counts])
+        order = np.argsort(t, kind='stable')
+        t, last_switch, gyro, counts = t[order], last_switch[order], gyro[order], counts[order]
+
+    # 重同步：相邻两帧之间（以及第一帧之前）存在被跳过的字节
+    # 原始数据只是片段时（多为后续读取才补全的不完整数据包），无法区分垃圾数据与
+    # 未记录的部分，不统计重同步，只给出不属于任何数据包的字节数
+    if not raw_contiguous:
+        resync_errors = None
+        skipped_bytes = None
+        trailing_bytes = None
+    elif raw_frames:
+        frame_ends = np.concatenate([[0], starts[:-1] + size])
+        skipped = starts - frame_ends
+        resync_errors = int(np.count_nonzero(skipped))
+        skipped_bytes = int(skipped.sum())
+        trailing_bytes = int(len(data) - (starts[-1] + size))
+    else:
+        resync_errors = 0
+        skipped_bytes = len(data)
+        trailing_bytes = 0
+
+    # 时间间隙：按所有数据块和数据行的时间计算
+    all_times = np.concatenate([chunk_times, t])
+    valid_times = np.sort(all_times[~np.isnan(all_times)])
+    intervals = np.diff(valid_times)
+    gaps = intervals[intervals > gap_threshold]
+
+    np.savez(os.path.join(out_dir, f"{name}.npz"),
+             t=t, last_switch=last_switch, gyro=gyro.astype(np.float32), count=counts,
+             fields=np.array(protocol.GYRO_FIELDS))
+
+    summary = {
+        'session': name,
+        'path': path,
+        'source': source,
+        'bytes': len(data),
+        'chunks': len(chunk_ends),
+        'raw_contiguous': raw_contiguous,
+        'unframed_bytes': None if raw_contiguous else unframed_bytes,
+        'logged_discarded_bytes': logged_discarded,
+        'raw_frames': raw_frames,
+        'decoded_lines': decoded_lines,
+        'decoded_rows': decoded_rows,
+        'decoded_frames': decoded_frames,
+        'rows': len(t),
+        'frames': int(counts.sum()),
+        'resync_errors': resync_errors,
+        'crc_errors': protocol.crc_errors,
+        'skipped_bytes': skipped_bytes,
+        'trailing_bytes': trailing_bytes,
+        'start_time': float(valid_times[0]) if len(valid_times) else None,
+        'end_time': float(valid_times[-1]) if len(valid_times) else None,
+        'duration': float(valid_times[-1] - valid_times[0]) if len(valid_times) else 0.0,
+        'gaps': int(len(gaps)),
+        'max_gap': float(gaps.max()) if len(gaps) else 0.0,
+        'total_gap_time': float(gaps.sum()),
+        'last_switch_counts': {str(k): int(counts[last_switch == k].sum())
+                               for k in np.unique(last_switch)},
+        'imu': imu_stats(gyro, counts, protocol.GYRO_FIELDS),
+        'process_time': time.perf_counter() - started,
+    }
+    with open(os.path.join(out_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+REPORT_COLUMNS = ['session', 'source', 'frames', 'raw_frames', 'decoded_frames', 'resync_errors', 'crc_errors', 'skipped_bytes', 'raw_contiguous', 'unframed_bytes', 'logged_discarded_bytes', 'bytes', 'chunks',
+                  'duration', 'gaps', 'max_gap', 'process_time', 'path']
+
+
+def write_report(summaries, failures, out_dir, elapsed, jobs):
+    """写出汇总报告 report.json 和 report.csv"""
+    summaries = sorted(summaries, key=lambda s: s['session'])
+    totals = {
+        'sessions': len(summaries),
+        'failed': len(failures),
+        'frames': sum(s['frames'] for s in summaries),
+        'raw_frames': sum(s['raw_frames'] for s in summaries),
+        'decoded_frames': sum(s['decoded_frames'] for s in summaries),
+        # 原始数据不连续的会话不统计重同步
+        'resync_errors': sum(s['resync_errors'] or 0 for s in summaries),
+        'crc_errors': sum(s['crc_errors'] for s in summaries),
+        'skipped_bytes': sum(s['skipped_bytes'] or 0 for s in summaries),
+        'fragmented_sessions': sum(1 for s in summaries if not s['raw_contiguous']),
+        'logged_discarded_bytes': sum(s['logged_discarded_bytes'] for s in summaries),
+        'bytes': sum(s['bytes'] for s in summaries),
+        'gaps': sum(s['gaps'] for s in summaries),
+        'cpu_time': sum(s['process_time'] for s in summaries),
+        'wall_time': elapsed,
+        'jobs': jobs,
+    }
+    report = {'totals': totals, 'sessions': summaries, 'failures': failures}
+    with open(os.path.join(out_dir, 'report.json'), 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(out_dir, 'report.csv'), 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(summaries)
+    return totals
+
+
+def main(argv=None):
+    """批处理命令行入口"""
+    parser = argparse.ArgumentParser(description="离线批量解码和汇总接收日志与遥测归档")
+    parser.add_argument('paths', nargs='+', help="会话日志文件、归档文件(.tla)或目录")
+    parser.add_argument('-o', '--output', default='batch_output', help="输出目录 (默认 batch_output)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help="工作进程数 (默认CPU核心数)")
+    parser.add_argument('-p', '--pattern', default='*log*.txt',
+                        help="目录中匹配日志文件的通配符 (默认 *log*.txt)")
+    parser.add_argument('--archive-pattern', default='*' + ARCHIVE_SUFFIX,
+                        help="目录中匹配遥测归档的通配符 (默认 *.tla)")
+    parser.add_argument('--gap', type=float, default=2.0,
+                        help="判定为时间间隙的最小间隔，单位秒 (默认2.0)")
+    parser.add_argument('--crc', choices=['crc8', 'crc16'], default=None,
+                        help="日志数据所用的校验模式 (默认无校验)")
+    args = parser.parse_args(argv)
+
+    files = discover_sessions(args.paths, [args.pattern, args.archive_pattern])
+    if not files:
+        print("未找到会话日志")
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+    names = session_names(files)
+    jobs = max(1, min(args.jobs, len(files)))
+    print(f"共 {len(files)} 个会话，使用 {jobs} 个进程")
+
+    started = time.perf_counter()
+    summaries = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(process_session, path, args.output, name, args.gap, args.crc): path
+            for path, name in zip(files, names)
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                print(f"处理失败 {path}: {e}")
+                failures.append({'path': path, 'error': str(e)})
+                continue
+            summaries.append(summary)
+            print(f"[{len(summaries) + len(failures)}/{len(files)}] {summary['session']}: "
+                  f"{summary['frames']}帧 (原始 {summary['raw_frames']}, 已解码 "
+                  f"{summary['decoded_frames']}), 重同步 "
+                  f"{'-' if summary['resync_errors'] is None else summary['resync_errors']}次, "
+                  f"间隙 {summary['gaps']}个")
+
+    elapsed = time.perf_counter() - started
+    totals = write_report(summaries, failures, args.output, elapsed, jobs)
+    print("-" * 60)
+    print(f"会话: {totals['sessions']}个 (失败 {totals['failed']}个)")
+    print(f"总帧数: {totals['frames']} (原始数据 {totals['raw_frames']}, "
+          f"已解码记录 {totals['decoded_frames']}), 重同步错误: {totals['resync_errors']}, "
+          f"跳过字节: {totals['skipped_bytes']}")
+    if totals['fragmented_sessions']:
+        print(f"原始数据不连续的会话: {totals['fragmented_sessions']}个 (未统计重同步)")
+    print(f"耗时: {elapsed:.2f}秒 (CPU {totals['cpu_time']:.2f}秒)")
+    print(f"报告已写入 {os.path.join(args.output, 'report.json')}")
+    return 0 if not failures else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
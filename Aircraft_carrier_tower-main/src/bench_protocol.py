@@ -0,0 +1,137 @@
+"""
+协议校验开销与重同步效果测试
+
+用法:
+    python src/bench_protocol.py [--frames 帧数] [--drop 概率] [--flip 概率] [--garbage 概率]
+
+生成带噪声的下行数据流（丢字节、比特翻转、插入垃圾数据），分别在无校验、
+CRC-8、CRC-16模式下按随机分块送入process_receive_data，统计完好帧、
+被错误接受的帧（损坏帧或伪帧）、丢失帧，以及编码/解码的单帧耗时。
+"""
+import sys
+import time
+import struct
+import argparse
+import numpy as np
+
+from protocol import Protocol
+
+DOWN_FORMAT = '<B B 9f B'
+
+
+def build_stream(protocol, n, drop, flip, garbage, seed):
+    """
+    生成带噪声的下行数据流
+    gx字段为帧序号，用于判断解码结果是否为完好的原始帧
+    Returns:
+        tuple: (stream, originals) originals为 帧序号 -> 原始数据包（不含校验）
+    """
+    rng = np.random.default_rng(seed)
+    payloads = rng.uniform(-1000.0, 1000.0, size=(n, 8)).astype(np.float32)
+    originals = {}
+    parts = []
+    for i in range(n):
+        body = struct.pack(DOWN_FORMAT, protocol.DOWN_HEADER, i % 3, float(i),
+                           *payloads[i].tolist(), protocol.DOWN_TAIL)
+        originals[i] = body
+        frame = bytearray(protocol.append_crc(body))
+        if rng.random() < flip:
+            # 翻转数据区的一个比特
+            pos = int(rng.integers(1, protocol.DOWN_BASE_SZ - 1))
+            frame[pos] ^= 1 << int(rng.integers(0, 8))
+        if rng.random() < drop:
+            # 丢失一个字节（帧被截断）
+            del frame[int(rng.integers(0, len(frame)))]
+        if rng.random() < garbage:
+            # 插入垃圾数据，包头字节比例偏高
+            junk = rng.integers(0, 256, size=int(rng.integers(1, 60)), dtype=np.uint8)
+            junk[rng.random(len(junk)) < 0.1] = protocol.DOWN_HEADER
+            parts.append(junk.tobytes())
+        parts.append(bytes(frame))
+    return b''.join(parts), originals
+
+
+def run_stream(protocol, stream, originals, seed):
+    """按随机分块送入流式解析器，统计结果"""
+    rng = np.random.default_rng(seed + 1)
+    sizes = rng.integers(1, 512, size=len(stream) // 64 + 2)
+    packets = []
+    started = time.perf_counter()
+    pos = 0
+    for size in sizes:
+        if pos >= len(stream):
+            break
+        packets.extend(protocol.process_receive_data(stream[pos:pos + int(size)]))
+        pos += int(size)
+    elapsed = time.perf_counter() - started
+
+    intact = set()
+    bad = 0
+    for packet in packets:
+        gyro = packet['gyro_data']
+        values = [gyro[name] for name in protocol.GYRO_FIELDS]
+        body = struct.pack(DOWN_FORMAT, protocol.DOWN_HEADER, packet['last_switch'],
+                           *values, protocol.DOWN_TAIL)
+        frame_id = values[0]
+        if frame_id == int(frame_id) and originals.get(int(frame_id)) == body:
+            intact.add(int(frame_id))
+        else:
+            bad += 1
+    return len(intact), bad, elapsed
+
+
+def time_encode(protocol, n):
+    """单帧编码耗时（逐帧 / 批量），单位微秒"""
+    started = time.perf_counter()
+    for i in range(n):
+        protocol.encode_up_frame(1, i % 1000, [90, 90, 90, 90])
+    single = (time.perf_counter() - started) / n * 1e6
+
+    switch = np.ones(n, dtype=np.int64)
+    fan = np.arange(n) % 1000
+    servo = np.full((n, 4), 90.0)
+    started = time.perf_counter()
+    protocol.encode_up_frames(switch, fan, servo)
+    batch = (time.perf_counter() - started) / n * 1e6
+    return single, batch
+
+
+def time_batch_decode(protocol, stream, n):
+    """向量化解码的单帧耗时，单位微秒"""
+    started = time.perf_counter()
+    frames, _ = protocol.decode_down_frames(stream)
+    return (time.perf_counter() - started) / n * 1e6, len(frames)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="协议校验开销与重同步效果测试")
+    parser.add_argument('--frames', type=int, default=50000, help="帧数 (默认50000)")
+    parser.add_argument('--drop', type=float, default=0.02, help="每帧丢字节概率 (默认0.02)")
+    parser.add_argument('--flip', type=float, default=0.02, help="每帧比特翻转概率 (默认0.02)")
+    parser.add_argument('--garbage', type=float, default=0.02, help="每帧前插入垃圾数据的概率 (默认0.02)")
+    parser.add_argument('--seed', type=int, default=1, help="随机种子")
+    args = parser.parse_args(argv)
+
+    n = args.frames
+    print(f"{n}帧，丢字节 {args.drop:.1%}，比特翻转 {args.flip:.1%}，垃圾数据 {args.garbage:.1%}")
+    print(f"{'校验':>6} {'完好帧':>8} {'错误接受':>8} {'丢失帧':>8} {'校验拒绝':>8} "
+          f"{'流式解码us':>10} {'批量解码us':>10} {'编码us':>8} {'批量编码us':>10}")
+    for mode in (None, 'crc8', 'crc16'):
+        protocol = Protocol()
+        protocol.set_crc_mode(mode)
+        stream, originals = build_stream(protocol, n, args.drop, args.flip, args.garbage, args.seed)
+        intact, bad, elapsed = run_stream(protocol, stream, originals, args.seed)
+        crc_rejected = protocol.crc_errors
+
+        batch_protocol = Protocol()
+        batch_protocol.set_crc_mode(mode)
+        batch_us, _ = time_batch_decode(batch_protocol, stream, n)
+        encode_us, encode_batch_us = time_encode(protocol, min(n, 20000))
+
+        print(f"{mode or '无':>6} {intact:8d} {bad:8d} {n - intact:8d} {crc_rejected:8d} "
+              f"{elapsed / n * 1e6:10.2f} {batch_us:10.3f} {encode_us:8.2f} {encode_batch_us:10.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,8 +2,23 @@ import time
 import threading
 import os
 import datetime
+from collections import namedtuple
+import numpy as np
 from serial_thread import SerialThread
 from protocol import Protocol
+from trajectory import TrajectoryPlayer
+from decimation import DecimationStage
+from archive import TelemetryArchiveWriter, TelemetryArchiveReader
+from reliable import ReliableCommandChannel
+
+
+# 控制器状态快照，由get_snapshot生成，供仪表盘等只读显示使用
+TelemetrySnapshot = namedtuple('TelemetrySnapshot', [
+    'timestamp', 'connected', 'auto_sending', 'trajectory_playing',
+    'switch', 'fan_rpm', 'servo_angles',
+    'receive_count', 'frame_count', 'byte_count',
+    'telemetry', 'telemetry_age',
+])
 
 
 class CommandControl:
@@ -31,11 +46,44 @@ class CommandControl:
         self.current_servo_angles = [0.0, 0.0, 0.0, 0.0]
         # 接收数据统计
         self.receive_count = 0
+        self.frame_count = 0
+        self.byte_count = 0
+        # 最新一帧遥测：(数据行, 接收时间)，整体替换以保证读取时的一致性
+        self.latest_telemetry = None
         
         # 新增日志相关属性
         self.log_file_path = "receive_log.txt"
         self.max_log_lines = 1000  # 最大日志行数
         self.log_enabled = True    # 是否启用日志
+
+        # 降采样层：日志/控制台等输出按各自频率运行，与遥测速率无关
+        self.decimation = DecimationStage(self.protocol.DOWN_FIELDS)
+        self.log_rate = 2.0  # 日志写入频率，Hz
+        self.decimation.add_consumer('log', self._log_telemetry, self.log_rate, mode='mean')
+        self.monitor_mode = 'last'  # 控制台遥测显示的降采样模式
+        # 已写入日志的丢弃字节数（protocol.discarded_bytes的快照）及上次单独记录的时间
+        self.discarded_logged = 0
+        self.last_discard_log = 0.0
+        self.discard_lock = threading.Lock()
+        # 上一次收到数据的时间，用于在两次读取之间插值每帧的时间戳
+        self.last_receive_time = None
+        # 单次读取的最大时间跨度，单位秒（串口线程约每10ms读取一次）
+        self.max_receive_span = 0.05
+
+        # 遥测归档写入器（全速率记录，作为降采样层的record_sink）
+        self.archive_writer = None
+
+        # 可靠命令通道：开关命令以last_switch为确认，超时重传，优先发送
+        self.command_channel = ReliableCommandChannel(
+            self._encode_switch_frame,
+            self.serial_thread.send_priority
+        )
+
+        # 控制轨迹回放器
+        self.trajectory_player = TrajectoryPlayer(self.protocol)
+        # 可靠开关命令的序号，回放结束时据此判断回放期间是否有新命令
+        self.reliable_sequence = 0
+        self.trajectory_sequence = 0
         
     def list_ports(self):
         """列出所有可用的串口端口"""
@@ -71,6 +119,10 @@ class CommandControl:
             self.serial_thread.start()
             # 设置接收数据回调函数
             self.serial_thread.add_receive_callback(self.handle_received_data)
+            # 启动命令通道的重传线程
+            self.command_channel.start()
+            # 启动降采样层的定时输出
+            self.decimation.start()
             print(f"成功连接到 {port_name}")
             self.running = True
             return True
@@ -80,12 +132,18 @@ class CommandControl:
             
     def disconnect_serial(self):
         """断开串口连接"""
-        # 停止自动发送
+        # 停止轨迹回放和自动发送
+        self.stop_trajectory()
         self.stop_auto_send()
+        # 停止命令通道，丢弃未确认的命令
+        self.command_channel.stop()
         # 停止串口线程
         self.serial_thread.stop()
         # 关闭串口连接
         self.serial_thread.close_serial()
+        # 停止降采样层，输出最后不足一个周期的数据
+        self.decimation.stop()
+        self.last_receive_time = None
         self.running = False
         print("串口连接已断开")
         
@@ -205,18 +263,58 @@ class CommandControl:
         return success
 
         
+    def _encode_switch_frame(self, switch_cmd):
+        """命令通道发送时调用：按当前控制数据编码携带该开关值的数据包"""
+        return self.protocol.encode_up_frame(
+            switch_cmd,
+            self.current_fan_rpm,
+            self.current_servo_angles
+        )
+
+    def send_reliable_command(self, switch_cmd, fan_rpm=None, servo_angles=None):
+        """
+        通过可靠命令通道发送开关命令，等待航模回传的last_switch确认，超时自动重传
+        当前开关值立即更新（自动发送也随之改变），并替代尚未确认的旧开关命令
+        正在回放的轨迹先被中止，否则后续轨迹帧会覆盖该命令
+        风扇转速和舵机角度（如提供）立即更新，随开关命令一同发送
+        Returns:
+            PendingCommand: 已提交的命令，失败时返回None
+        """
+        if not self.serial_thread.is_connected():
+            print("错误：串口未连接")
+            return None
+        if servo_angles is not None and len(servo_angles) != 4:
+            print("错误：舵机角度必须是4个值的列表")
+            return None
+        # 中止回放后当前控制数据为轨迹最后发送的帧
+        self.stop_trajectory()
+        self.reliable_sequence += 1
+        if fan_rpm is not None:
+            self.current_fan_rpm = fan_rpm
+        if servo_angles is not None:
+            self.current_servo_angles = servo_angles
+        self.current_switch = switch_cmd
+        return self.command_channel.send_command(switch_cmd)
+
     def start_auto_send(self, interval=0.1):
-        """启动自动发送模式，按指定间隔发送控制数据"""
+        """启动自动发送模式，按指定间隔发送控制数据
+        Returns:
+            bool: 是否成功启动
+        """
         # 检查是否已连接
         if not self.serial_thread.is_connected():
             print("错误：串口未连接")
-            return
+            return False
+        # 自动发送的帧会插入轨迹中间，回放期间不能启动
+        if self.trajectory_player.playing:
+            print("错误：轨迹回放正在运行，请先停止")
+            return False
             
         # 检查是否已在自动发送（使用线程锁保护）
         with self.auto_send_lock:
             if self.auto_sending:
                 print("自动发送已在运行")
-                return
+                return False
                 
             # 设置发送间隔和运行标志
             self.send_interval = interval
@@ -229,6 +327,7 @@ class CommandControl:
         )
         self.auto_send_thread.start()
         print(f"自动发送已启动，间隔: {interval}秒")
+        return True
         
     def stop_auto_send(self):
         """停止自动发送模式"""
@@ -253,26 +352,253 @@ class CommandControl:
             # 等待指定间隔
             time.sleep(self.send_interval)
             
+    def load_trajectory(self, path, rate=None):
+        """加载控制轨迹文件（CSV或NPY）并预编码所有帧"""
+        if self.trajectory_player.playing:
+            print("错误：轨迹回放正在运行，请先停止")
+            return False
+        if not self.trajectory_player.load(path, rate):
+            return False
+        player = self.trajectory_player
+        print(f"已加载轨迹 {path}: {len(player.frames)}帧，时长 {player.times[-1]:.3f}秒")
+        return True
+
+    def start_trajectory(self):
+        """开始回放已加载的控制轨迹"""
+        if not self.serial_thread.is_connected():
+            print("错误：串口未连接")
+            return False
+        # 自动发送的帧会插入轨迹中间，回放期间必须停止
+        if self.auto_sending:
+            self.stop_auto_send()
+        self.trajectory_sequence = self.reliable_sequence
+        if not self.trajectory_player.start(self.serial_thread.send_data_direct,
+                                            self._on_trajectory_finished):
+            return False
+        print("轨迹回放已开始")
+        return True
+
+    def stop_trajectory(self):
+        """中止轨迹回放"""
+        if self.trajectory_player.playing:
+            self.trajectory_player.stop()
+            print("轨迹回放已中止")
+
+    def _on_trajectory_finished(self):
+        """回放结束：当前控制数据与最后发送的帧保持一致（回放期间发送过可靠命令时保留命令的值）"""
+        last = self.trajectory_player.last_values()
+        if last is not None and self.trajectory_sequence == self.reliable_sequence:
+            self.current_switch, self.current_fan_rpm, self.current_servo_angles = last
+        print(f"轨迹回放结束，已发送 {self.trajectory_player.sent_count} 帧")
+
     def handle_received_data(self, data):
         """处理从航模接收到的数据"""
         # 增加接收计数
         self.receive_count += 1
+        self.byte_count += len(data)
         
         # 使用协议处理器解析数据
         try:
             parsed_data = self.protocol.process_receive_data(data)
             if parsed_data:
-                # 写入日志
-                self._write_to_log(f"接收数据 [{self.receive_count}]: {parsed_data}") 
+                # 交给降采样层，由各消费者按自身频率输出
+                values = self.protocol.packets_to_array(parsed_data)
+                times = self._frame_times(len(values))
+                now = time.monotonic()
+                self.frame_count += len(values)
+                self.latest_telemetry = (values[-1], now)
+                # 检查是否确认了命令通道中的开关命令
+                self.command_channel.on_telemetry(values[:, 0], now)
+                self.decimation.push(times, values)
             else:
-                # 显示原始数据（十六进制格式）
-                hex_data = data.hex().upper()
-                self._write_to_log(f"接收原始数据 [{self.receive_count}]: {hex_data}")
+                # 没有完整数据包：不完整的部分留在缓冲区等待后续数据，
+                # 被丢弃的字节只计数，按日志频率汇总记录，不逐次写日志
+                self._log_discarded()
         except Exception as e:
             hex_data = data.hex().upper()
             self._write_to_log(f"数据解析错误: {e}")
             self._write_to_log(f"接收原始数据 [{self.receive_count}]: {hex_data}")
             
+    def _frame_times(self, count):
+        """
+        为一次读取中的各帧插值时间戳：这些帧在上次读取之后陆续到达，
+        均匀分布在 (上次读取, 本次读取] 之间，最后一帧为当前时间
+        """
+        now = time.time()
+        last = self.last_receive_time
+        self.last_receive_time = now
+        if last is None or now <= last:
+            span = 0.0
+        else:
+            span = min(now - last, self.max_receive_span)
+        return now - span + span * np.arange(1, count + 1) / count
+
+    def _format_telemetry(self, values):
+        """将一行遥测数据格式化为 名称=值 的文本"""
+        return ", ".join(f"{name}={value:.3f}" for name, value in
+                         zip(self.decimation.columns, values))
+
+    def _take_discarded(self):
+        """返回自上次记录以来协议解析丢弃的字节数（日志消费者与串口线程都会调用）"""
+        with self.discard_lock:
+            discarded = self.protocol.discarded_bytes
+            dropped = discarded - self.discarded_logged
+            self.discarded_logged = discarded
+            return dropped
+
+    def _log_telemetry(self, times, values, count):
+        """日志消费者：每个周期写入一条均值记录，附带本周期丢弃的字节数"""
+        dropped = self._take_discarded()
+        self.last_discard_log = time.monotonic()
+        self._write_to_log(f"接收数据 [{self.receive_count}]: {count}帧均值 "
+                           f"{self._format_telemetry(values[0])}"
+                           + (f", 丢弃字节={dropped}" if dropped else ""))
+
+    def _log_discarded(self):
+        """没有解析出数据包时，按日志频率记录被丢弃的字节数"""
+        now = time.monotonic()
+        if now - self.last_discard_log < 1.0 / self.log_rate:
+            return
+        if self.protocol.discarded_bytes == self.discarded_logged:
+            return
+        self.last_discard_log = now
+        self._write_to_log(f"丢弃未解析数据 [{self.receive_count}]: {self._take_discarded()}字节")
+
+    def _print_telemetry(self, times, values, count):
+        """控制台消费者：打印降采样后的遥测数据"""
+        if self.monitor_mode == 'minmax':
+            print(f"[遥测 {count}帧] 最小: {self._format_telemetry(values[0])}")
+            print(f"[遥测 {count}帧] 最大: {self._format_telemetry(values[1])}")
+        else:
+            for row in values:
+                print(f"[遥测 {count}帧] {self._format_telemetry(row)}")
+
+    def start_monitor(self, rate=1.0, mode='last'):
+        """在控制台按指定频率显示遥测数据"""
+        try:
+            self.decimation.add_consumer('console', self._print_telemetry, rate,
+                                         mode=mode, points=5)
+        except ValueError as e:
+            print(f"错误：{e}")
+            return False
+        self.monitor_mode = mode
+        print(f"遥测监视已启动，频率: {rate}Hz，模式: {mode}")
+        return True
+
+    def stop_monitor(self):
+        """停止控制台遥测显示"""
+        if self.decimation.remove_consumer('console'):
+            print("遥测监视已停止")
+
+    def start_archive(self, path=None, codec='zlib'):
+        """开始将全速率遥测写入压缩归档"""
+        if self.archive_writer is not None:
+            print(f"归档已在运行: {self.archive_writer.path}")
+            return False
+        if path is None:
+            path = datetime.datetime.now().strftime("telemetry_%Y%m%d_%H%M%S.tla")
+        try:
+            self.archive_writer = TelemetryArchiveWriter(path, codec=codec)
+        except Exception as e:
+            print(f"创建归档文件错误: {e}")
+            return False
+        self.decimation.record_sink = self.archive_writer.write
+        print(f"遥测归档已开始: {path} ({codec})")
+        return True
+
+    def stop_archive(self):
+        """停止归档并写入索引"""
+        writer = self.archive_writer
+        if writer is None:
+            return
+        self.decimation.record_sink = None
+        self.archive_writer = None
+        try:
+            writer.close()
+        except Exception as e:
+            print(f"关闭归档文件错误: {e}")
+            return
+        frames, chunks, raw_bytes, size = writer.stats()
+        ratio = raw_bytes / size if size else 0.0
+        print(f"遥测归档已停止: {writer.path}，{frames}帧，{chunks}个数据块，"
+              f"{size}字节 (压缩比 {ratio:.1f})")
+
+    def query_archive(self, path, start=None, end=None):
+        """查询归档文件，start/end为相对归档起始时间的秒数
+        Returns:
+            bool: 归档文件是否可以读取
+        """
+        try:
+            reader = TelemetryArchiveReader(path)
+        except Exception as e:
+            print(f"打开归档文件错误: {e}")
+            return False
+        try:
+            time_range = reader.time_range()
+            print(f"归档文件: {path} ({reader.codec}{'，索引已从数据块重建' if reader.recovered else ''})")
+            print(f"数据块: {len(reader.index)}个，总帧数: {int(reader.index['frames'].sum())}")
+            if time_range is None:
+                return True
+            t_begin, t_finish = time_range
+            print(f"时间范围: {datetime.datetime.fromtimestamp(t_begin)} - "
+                  f"{datetime.datetime.fromtimestamp(t_finish)} ({t_finish - t_begin:.1f}秒)")
+            if start is None and end is None:
+                return True
+
+            t0 = t_begin + (start or 0.0)
+            t1 = t_begin + end if end is not None else None
+            t, last_switch, gyro = reader.read(t0, t1)
+            print(f"查询窗口内: {len(t)}帧")
+            if len(t):
+                means = gyro.astype(np.float64).mean(axis=0)
+                print(f"  均值: {self._format_telemetry([last_switch.mean()] + means.tolist())}")
+            return True
+        finally:
+            reader.close()
+
+    def set_crc_mode(self, mode):
+        """设置收发校验模式（None、"crc8"、"crc16"），须与航模固件一致"""
+        # 回放中的帧已按旧模式编码，不能中途切换
+        if self.trajectory_player.playing:
+            print("错误：轨迹回放正在运行，请先停止")
+            return False
+        try:
+            self.protocol.set_crc_mode(mode)
+        except ValueError as e:
+            print(f"错误：{e}")
+            return False
+        print(f"校验模式: {mode or '无'}，上行 {self.protocol.UP_FRAME_SZ}字节，"
+              f"下行 {self.protocol.DOWN_FRAME_SZ}字节")
+        if self.trajectory_player.reencode():
+            print(f"已按新校验模式重新编码轨迹: {len(self.trajectory_player.frames)}帧")
+        return True
+
+    def get_snapshot(self):
+        """获取当前链路、控制和遥测状态的快照（只读取引用，不阻塞串口线程）"""
+        latest = self.latest_telemetry
+        now = time.monotonic()
+        if latest is not None:
+            row, received_at = latest
+            telemetry = dict(zip(self.protocol.DOWN_FIELDS, row.tolist()))
+            telemetry_age = now - received_at
+        else:
+            telemetry = None
+            telemetry_age = None
+        return TelemetrySnapshot(
+            timestamp=now,
+            connected=bool(self.serial_thread.is_connected()),
+            auto_sending=self.auto_sending,
+            trajectory_playing=self.trajectory_player.playing,
+            switch=self.current_switch,
+            fan_rpm=self.current_fan_rpm,
+            servo_angles=tuple(self.current_servo_angles),
+            receive_count=self.receive_count,
+            frame_count=self.frame_count,
+            byte_count=self.byte_count,
+            telemetry=telemetry,
+            telemetry_age=telemetry_age,
+        )
+
     def print_status(self):
         """打印当前状态信息"""
         print("\n当前状态:")
@@ -285,10 +611,22 @@ class CommandControl:
         print(f"    舵机角度: {self.current_servo_angles}")
         print(f"  接收数据包: {self.receive_count}个")
         print(f"  日志状态: {'启用' if self.log_enabled else '禁用'}")
+        print(f"  日志频率: {self.log_rate}Hz")
+        print(f"  校验模式: {self.protocol.crc_mode or '无'}，校验错误: {self.protocol.crc_errors}个")
+        print(f"  遥测监视: {'运行中' if self.decimation.has_consumer('console') else '停止'}")
+        self.command_channel.print_stats()
+        if self.archive_writer is not None:
+            frames, chunks, raw_bytes, size = self.archive_writer.stats()
+            print(f"  遥测归档: {self.archive_writer.path} ({frames}帧, {chunks}块, {size}字节)")
+        else:
+            print("  遥测归档: 停止")
+        print(f"  轨迹回放: {'运行中' if self.trajectory_player.playing else '停止'}")
         # 显示日志文件信息
         self.show_log_info()
         
     def cleanup(self):
         """清理资源"""
+        self.stop_trajectory()
         self.stop_auto_send()
+        self.stop_archive()
         self.disconnect_serial()
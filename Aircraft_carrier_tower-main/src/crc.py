@@ -0,0 +1,97 @@
+import numpy as np
+
+
+def _make_crc8_table():
+    """CRC-8/MAXIM查表（多项式0x31，输入输出反转，即右移算法多项式0x8C）"""
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8C if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+def _make_crc16_table():
+    """CRC-16/CCITT-FALSE查表（多项式0x1021，初值0xFFFF，不反转）"""
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+        table.append(crc & 0xFFFF)
+    return table
+
+
+CRC8_TABLE = _make_crc8_table()
+CRC16_TABLE = _make_crc16_table()
+CRC8_TABLE_NP = np.array(CRC8_TABLE, dtype=np.uint8)
+CRC16_TABLE_NP = np.array(CRC16_TABLE, dtype=np.uint16)
+
+# 校验模式 -> 校验字节数
+CRC_SIZES = {None: 0, 'crc8': 1, 'crc16': 2}
+
+
+def crc8(data):
+    """计算CRC-8/MAXIM，"123456789"的结果为0xA1"""
+    crc = 0
+    table = CRC8_TABLE
+    for byte in data:
+        crc = table[crc ^ byte]
+    return crc
+
+
+def crc16(data):
+    """计算CRC-16/CCITT-FALSE，"123456789"的结果为0x29B1"""
+    crc = 0xFFFF
+    table = CRC16_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+
+def crc8_rows(rows):
+    """
+    对一批等长数据逐行计算CRC-8（按列循环，每步对所有行向量化查表）
+    Args:
+        rows: np.ndarray (n, L) uint8
+    Returns:
+        np.ndarray: (n,) uint8
+    """
+    crc = np.zeros(len(rows), dtype=np.uint8)
+    for j in range(rows.shape[1]):
+        crc = CRC8_TABLE_NP[crc ^ rows[:, j]]
+    return crc
+
+
+def crc16_rows(rows):
+    """
+    对一批等长数据逐行计算CRC-16（按列循环，每步对所有行向量化查表）
+    Args:
+        rows: np.ndarray (n, L) uint8
+    Returns:
+        np.ndarray: (n,) uint16
+    """
+    crc = np.full(len(rows), 0xFFFF, dtype=np.uint16)
+    for j in range(rows.shape[1]):
+        index = (crc >> 8) ^ rows[:, j]
+        crc = (crc << 8) ^ CRC16_TABLE_NP[index]
+    return crc
+
+
+def compute_crc(mode, data):
+    """按模式计算单个数据包的校验值，mode为None时返回None"""
+    if mode == 'crc8':
+        return crc8(data)
+    if mode == 'crc16':
+        return crc16(data)
+    return None
+
+
+def compute_crc_rows(mode, rows):
+    """按模式对一批数据包计算校验值"""
+    if mode == 'crc8':
+        return crc8_rows(rows)
+    if mode == 'crc16':
+        return crc16_rows(rows)
+    raise ValueError(f"未知校验模式: {mode}")
@@ -0,0 +1,217 @@
+import time
+import threading
+from collections import deque
+from contextlib import redirect_stdout
+
+
+class MessageBuffer:
+    """
+    替代stdout的消息缓冲区，仪表盘运行期间收集各处print的输出
+    redirect_stdout对整个进程生效，串口线程等也会写入：写入和读取加锁，
+    未结束的行按线程分别缓存（print的内容和换行是两次write，不同线程之间可能交错）
+    """
+
+    def __init__(self, max_lines=200):
+        self.lines = deque(maxlen=max_lines)
+        self.partial = {}
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        thread_id = threading.get_ident()
+        with self.lock:
+            *complete, rest = (self.partial.pop(thread_id, "") + text).split('\n')
+            if rest:
+                self.partial[thread_id] = rest
+            for line in complete:
+                if line:
+                    self.lines.append(line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def tail(self, n):
+        """返回最近n行消息"""
+        if n <= 0:
+            return []
+        with self.lock:
+            return list(self.lines)[-n:]
+
+
+class Dashboard:
+    """终端实时仪表盘 - 以固定帧率从控制器快照渲染，只重绘变化的行"""
+
+    def __init__(self, controller, execute, fps=10.0):
+        """
+        Args:
+            controller: CommandControl 控制器实例
+            execute: callable(controller, line) 命令执行函数
+            fps: float 刷新帧率
+        """
+        self.controller = controller
+        self.execute = execute
+        self.frame_interval = 1.0 / fps
+        self.fps = fps
+        self.messages = MessageBuffer()
+        self.input_line = ""
+        # 上一帧已绘制的每行内容，用于脏区域判断
+        self.drawn = []
+        # 速率计算：上一次采样的快照，以及平滑后的速率
+        self.rate_snapshot = None
+        self.frame_rate = 0.0
+        self.byte_rate = 0.0
+        self.running = False
+
+    def run(self):
+        """运行仪表盘直到用户退出，返回后回到命令行界面"""
+        try:
+            import curses
+        except ImportError:
+            print("仪表盘需要curses模块，Windows下请先安装: uv pip install windows-curses")
+            return
+
+        with redirect_stdout(self.messages):
+            curses.wrapper(self._main)
+        # 把仪表盘期间的消息补打到终端
+        for line in self.messages.tail(10):
+            print(line)
+
+    def _main(self, stdscr):
+        """curses主循环：等待输入的超时即为距下一帧的时间，空闲时几乎不占CPU"""
+        import curses
+        curses.curs_set(1)
+        stdscr.keypad(True)
+        self.running = True
+        self.drawn = []
+        next_frame = time.monotonic()
+
+        while self.running:
+            now = time.monotonic()
+            if now >= next_frame:
+                self._render(stdscr, curses)
+                next_frame += self.frame_interval
+                if next_frame < now:
+                    # 渲染落后时不追帧
+                    next_frame = now + self.frame_interval
+            stdscr.timeout(max(1, int((next_frame - time.monotonic()) * 1000)))
+            key = stdscr.getch()
+            if key != -1:
+                self._handle_key(key, curses)
+                # 输入行立即回显，不等下一帧
+                if self.running and self.drawn:
+                    self._draw_line(stdscr, curses, len(self.drawn) - 1,
+                                    f">>> {self.input_line}")
+                    stdscr.noutrefresh()
+                    curses.doupdate()
+
+    def _handle_key(self, key, curses):
+        """处理单个按键，回车时执行命令"""
+        if key == 27:
+            self.running = False
+        elif key in (curses.KEY_ENTER, 10, 13):
+            line = self.input_line.strip()
+            self.input_line = ""
+            if not line:
+                return
+            print(f">>> {line}")
+            command = line.split()[0].lower()
+            if command in ('q', 'exit', 'quit'):
+                # 在仪表盘中只退出仪表盘，不退出程序
+                self.running = False
+            elif command == 'dashboard':
+                print("仪表盘已在运行")
+            else:
+                self.execute(self.controller, line)
+        elif key in (curses.KEY_BACKSPACE, 127, 8):
+            self.input_line = self.input_line[:-1]
+        elif 32 <= key < 127:
+            self.input_line += chr(key)
+
+    def _update_rates(self, snapshot):
+        """根据相邻快照的计数差计算接收速率（指数平滑）"""
+        previous = self.rate_snapshot
+        self.rate_snapshot = snapshot
+        if previous is None:
+            return
+        dt = snapshot.timestamp - previous.timestamp
+        if dt <= 0:
+            return
+        frame_rate = (snapshot.frame_count - previous.frame_count) / dt
+        byte_rate = (snapshot.byte_count - previous.byte_count) / dt
+        alpha = min(1.0, dt)
+        self.frame_rate += alpha * (frame_rate - self.frame_rate)
+        self.byte_rate += alpha * (byte_rate - self.byte_rate)
+
+    def _build_lines(self, snapshot, height):
+        """根据快照生成每一行的文本"""
+        lines = [
+            f"航模地面站 - 实时仪表盘   刷新 {self.fps:g}fps   (ESC或q退出仪表盘)",
+            "-" * 60,
+            f"链路: {'已连接' if snapshot.connected else '未连接'}   "
+            f"自动发送: {'运行中' if snapshot.auto_sending else '停止'}   "
+            f"轨迹回放: {'运行中' if snapshot.trajectory_playing else '停止'}",
+            f"控制: 开关={snapshot.switch}  风扇={snapshot.fan_rpm}  "
+            f"舵机={list(snapshot.servo_angles)}",
+            f"接收: {snapshot.frame_count}帧  {self.frame_rate:8.1f}帧/秒  "
+            f"{self.byte_rate / 1024:8.2f}KB/秒",
+        ]
+
+        telemetry = snapshot.telemetry
+        if telemetry is None:
+            lines.append("数据延迟: --")
+            lines.extend(["IMU: 尚未收到数据", "", "", ""])
+        else:
+            lines.append(f"数据延迟: {snapshot.telemetry_age * 1000:8.1f}ms")
+            lines.append(f"IMU: last_switch={int(telemetry['last_switch'])}")
+            for label, names in (("陀螺仪", ('gx', 'gy', 'gz')),
+                                 ("加速度", ('ax', 'ay', 'az')),
+                                 ("磁力计", ('mx', 'my', 'mz'))):
+                values = "  ".join(f"{name}={telemetry[name]:10.3f}" for name in names)
+                lines.append(f"  {label}  {values}")
+
+        lines.append("-" * 60)
+        # 消息区占满剩余空间，最后一行留给输入
+        message_rows = height - len(lines) - 2
+        messages = self.messages.tail(message_rows)
+        lines.extend(messages + [""] * (message_rows - len(messages)))
+        lines.append("-" * 60)
+        lines.append(f">>> {self.input_line}")
+        return lines
+
+    def _render(self, stdscr, curses):
+        """渲染一帧：只重写与上一帧不同的行"""
+        height, width = stdscr.getmaxyx()
+        snapshot = self.controller.get_snapshot()
+        self._update_rates(snapshot)
+        lines = self._build_lines(snapshot, height)[:height]
+
+        if len(self.drawn) != len(lines):
+            # 终端尺寸变化，全部重绘
+            stdscr.erase()
+            self.drawn = [None] * len(lines)
+
+        changed = False
+        for row, line in enumerate(lines):
+            changed |= self._draw_line(stdscr, curses, row, line)
+        if changed:
+            stdscr.noutrefresh()
+            curses.doupdate()
+
+    def _draw_line(self, stdscr, curses, row, line):
+        """内容变化时重写一行，光标停在输入行末尾
+        Returns:
+            bool: 是否实际重写
+        """
+        if line == self.drawn[row]:
+            return False
+        self.drawn[row] = line
+        width = stdscr.getmaxyx()[1]
+        last_row = len(self.drawn) - 1
+        try:
+            stdscr.move(row, 0)
+            stdscr.clrtoeol()
+            stdscr.addnstr(row, 0, line, max(0, width - 1))
+            stdscr.move(last_row, min(len(self.drawn[last_row] or ""), max(0, width - 1)))
+        except curses.error:
+            pass
+        return True
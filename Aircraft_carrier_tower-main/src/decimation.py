@@ -0,0 +1,227 @@
+import time
+import threading
+import numpy as np
+
+
+def lttb_indices(t, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets降采样，返回被选中点的下标
+    桶均值用reduceat一次算出，每个桶内的三角形面积向量化计算
+    Args:
+        t: np.ndarray (n,) 时间
+        y: np.ndarray (n,) 用于选点的数据列
+        n_out: int 输出点数（包含首尾两点）
+    Returns:
+        np.ndarray: 升序的下标数组
+    """
+    n = len(t)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    # 去掉首尾后平均分成 n_out-2 个桶
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    t_avg = np.add.reduceat(t[1:n - 1], edges[:-1] - 1) / counts
+    y_avg = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts
+    # 最后一个桶的“下一桶均值”为终点
+    t_next = np.append(t_avg[1:], t[-1])
+    y_next = np.append(y_avg[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        tb, yb = t[lo:hi], y[lo:hi]
+        area = np.abs((t[prev] - t_next[b]) * (yb - y[prev])
+                      - (t[prev] - tb) * (y_next[b] - y[prev]))
+        prev = lo + int(np.argmax(area))
+        selected[b + 1] = prev
+    return selected
+
+
+class DecimatedConsumer:
+    """降采样消费者 - 按自身频率接收归约后的数据"""
+
+    def __init__(self, callback, rate, mode='last', points=50, column=0):
+        """
+        Args:
+            callback: callable(times, values, count) 输出回调
+                times: (m,) 时间, values: (m, k) 数据, count: 本周期原始帧数
+            rate: float 输出频率(Hz)
+            mode: str 'last' 最新值, 'mean' 均值, 'minmax' 最小/最大包络, 'lttb' LTTB降采样
+            points: int lttb模式下每个周期输出的点数
+            column: int lttb模式下用于选点的数据列
+        """
+        if mode not in DecimationStage.MODES:
+            raise ValueError(f"未知降采样模式: {mode}")
+        if rate <= 0:
+            raise ValueError("输出频率必须大于0")
+        self.callback = callback
+        self.period = 1.0 / rate
+        self.mode = mode
+        self.points = points
+        self.column = column
+        self.next_due = 0.0
+        self._reset()
+
+    def _reset(self):
+        """清空本周期的累积状态"""
+        self.count = 0
+        self.t_first = None
+        self.t_last = None
+        self.last = None
+        self.sum = None
+        self.min = None
+        self.max = None
+        self.batches = []
+
+    def accumulate(self, t, values):
+        """累积一批数据，除lttb外只保留固定大小的归约状态"""
+        if self.count == 0:
+            self.t_first = t[0]
+        self.t_last = t[-1]
+        self.count += len(t)
+
+        if self.mode == 'last':
+            self.last = values[-1]
+        elif self.mode == 'mean':
+            batch_sum = values.sum(axis=0)
+            self.sum = batch_sum if self.sum is None else self.sum + batch_sum
+        elif self.mode == 'minmax':
+            batch_min = values.min(axis=0)
+            batch_max = values.max(axis=0)
+            self.min = batch_min if self.min is None else np.minimum(self.min, batch_min)
+            self.max = batch_max if self.max is None else np.maximum(self.max, batch_max)
+        else:
+            self.batches.append((t, values))
+
+    def collect(self):
+        """计算本周期的输出并清空累积状态
+        Returns:
+            tuple: (times, values, count)，本周期没有数据时返回None
+        """
+        if self.count == 0:
+            return None
+        if self.mode == 'last':
+            times = np.array([self.t_last])
+            values = self.last[np.newaxis, :]
+        elif self.mode == 'mean':
+            times = np.array([self.t_last])
+            values = (self.sum / self.count)[np.newaxis, :]
+        elif self.mode == 'minmax':
+            times = np.array([self.t_first, self.t_last])
+            values = np.vstack([self.min, self.max])
+        else:
+            all_t = np.concatenate([b[0] for b in self.batches])
+            all_v = np.concatenate([b[1] for b in self.batches])
+            idx = lttb_indices(all_t, all_v[:, self.column], self.points)
+            times, values = all_t[idx], all_v[idx]
+
+        count = self.count
+        self._reset()
+        return times, values, count
+
+
+class DecimationStage:
+    """降采样层 - 位于解码与显示/日志等消费者之间，限制各消费者的输出频率"""
+
+    MODES = ('last', 'mean', 'minmax', 'lttb')
+
+    def __init__(self, columns):
+        """
+        Args:
+            columns: list 数据列名
+        """
+        self.columns = list(columns)
+        self.consumers = {}
+        # 全速率记录接收端，callable(times, values)，每批数据都会调用
+        self.record_sink = None
+        self.lock = threading.Lock()
+        # 定时检查线程：链路安静时也能按周期输出已累积的数据
+        self.tick = 0.05
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """启动定时检查线程"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止定时检查线程，并输出各消费者最后不足一个周期的数据"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        self.flush(force=True)
+
+    def _run(self):
+        """定时检查线程：每tick输出已到期的消费者"""
+        while not self.stop_event.wait(self.tick):
+            self.flush()
+
+    def add_consumer(self, name, callback, rate, mode='last', points=50, column=0):
+        """添加（或替换）一个消费者，参数见DecimatedConsumer"""
+        consumer = DecimatedConsumer(callback, rate, mode, points, column)
+        with self.lock:
+            self.consumers[name] = consumer
+        return consumer
+
+    def remove_consumer(self, name):
+        """移除消费者"""
+        with self.lock:
+            return self.consumers.pop(name, None) is not None
+
+    def has_consumer(self, name):
+        """检查消费者是否存在"""
+        return name in self.consumers
+
+    def push(self, times, values):
+        """
+        推入一批解码后的数据
+        Args:
+            times: np.ndarray (n,) 时间戳
+            values: np.ndarray (n, k) 数据，列顺序与columns一致
+        """
+        if len(times) == 0:
+            return
+
+        sink = self.record_sink
+        if sink is not None:
+            try:
+                sink(times, values)
+            except Exception as e:
+                print(f"记录接收端执行错误: {e}")
+
+        with self.lock:
+            for consumer in self.consumers.values():
+                consumer.accumulate(times, values)
+        self.flush()
+
+    def flush(self, force=False):
+        """
+        输出已到期且有累积数据的消费者
+        Args:
+            force: bool 为True时不论是否到期都输出（用于停止时）
+        """
+        now = time.monotonic()
+        outputs = []
+        with self.lock:
+            for consumer in self.consumers.values():
+                if consumer.count and (force or now >= consumer.next_due):
+                    consumer.next_due = now + consumer.period
+                    outputs.append((consumer.callback, consumer.collect()))
+
+        # 回调可能较慢（写文件/打印），在锁外执行
+        for callback, result in outputs:
+            try:
+                callback(*result)
+            except Exception as e:
+                print(f"降采样消费者回调执行错误: {e}")
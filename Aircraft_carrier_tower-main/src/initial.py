@@ -84,6 +84,16 @@ class SerialInitializer:
             print(f"接收数据失败: {e}")
             return None
     
+    def bytes_waiting(self):
+        """返回接收缓冲区中已到达的字节数"""
+        if not self.serial_port or not self.serial_port.is_open:
+            return 0
+        try:
+            return self.serial_port.in_waiting
+        except Exception as e:
+            print(f"查询接收缓冲区错误: {e}")
+            return 0
+
     def is_connected(self):
         """检查串口是否连接"""
         return self.serial_port and self.serial_port.is_open
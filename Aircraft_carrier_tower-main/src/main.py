@@ -2,6 +2,8 @@ import sys
 import argparse
 import logging
 from command import CommandControl
+from dashboard import Dashboard
+from script import ScriptRunner, ScriptError, parse_script
 def show_welcome():
     """显示欢迎信息"""
     print("="*60)
@@ -18,14 +20,25 @@ def show_help():
     print("  connect <端口> [波特率] - 连接串口 (默认115200)")
     print("  disconnect              - 断开串口连接")
     print("  set throttle <值>       - 设置油门值 (0-65535)")
-    print("  set switch <值>         - 设置总开关 (0=关, 1=开, 2=特殊模式)")
+    print("  set switch <值>         - 设置总开关 (0=关, 1=开, 2=特殊模式)，等待确认并自动重传")
     print("  set servo <角度列表>    - 设置4个舵机角度")
+    print("  crc [none|crc8|crc16]   - 设置收发校验模式 (须与航模固件一致)")
     print("  auto [间隔]             - 启动自动发送 (默认0.1秒)")
     print("  stop                    - 停止自动发送")
     print("  status                  - 显示当前状态")
+    print("  dashboard [帧率]        - 进入实时仪表盘 (默认10fps，ESC退出)")
     print("  log [行数]              - 显示最近的接收数据 (默认20行)")
     print("  log clear               - 清空日志文件")
     print("  log info                - 显示日志文件信息")
+    print("  monitor [频率] [模式]   - 在控制台显示遥测 (默认1Hz, 模式: last/mean/minmax/lttb)")
+    print("  monitor off             - 停止遥测显示")
+    print("  archive start [文件] [zlib|lzma] - 开始全速率遥测压缩归档")
+    print("  archive stop            - 停止归档并写入索引")
+    print("  archive query <文件> [起始秒 结束秒] - 查询归档 (时间相对归档起点)")
+    print("  traj load <文件> [频率] - 加载控制轨迹 (CSV/NPY，无time列时按频率回放)")
+    print("  traj play               - 开始回放已加载的轨迹")
+    print("  traj stop               - 中止轨迹回放")
+    print("  traj report [文件]      - 显示回放时序误差 (可保存逐帧误差到CSV)")
     print("  b                       - 预设命令：开关=0（关闭）")
     print("  a                       - 预设命令：开关=1，风扇=1500，舵机=45度")
     print("  help                    - 显示此帮助信息")
@@ -33,10 +46,10 @@ def show_help():
     print()
 
 def parse_set_command(controller, args):
-    """解析set命令和日志命令"""
+    """解析set命令和日志命令，返回命令是否执行成功"""
     if len(args) < 1:
         print("用法: set <参数> <值> 或 log [选项]")
-        return
+        return False
         
     # 处理日志命令
     if args[0].lower() == 'log':
@@ -56,12 +69,13 @@ def parse_set_command(controller, args):
                 controller.show_log(lines)
             except ValueError:
                 print("错误：行数必须是数字")
-        return
+                return False
+        return True
         
     # 原有的set命令处理
     if len(args) < 2:
         print("用法: set <参数> <值>")
-        return
+        return False
         
     param_type = args[0].lower()
     value_str = args[1]
@@ -70,9 +84,10 @@ def parse_set_command(controller, args):
         # 设置油门值（根据协议要求使用float类型）
         try:
             fan_rpm = float(value_str)
-            controller.send_control_data(fan_rpm=fan_rpm)
+            return controller.send_control_data(fan_rpm=fan_rpm)
         except ValueError:
             print("错误：油门值必须是数字")
+            return False
             
     elif param_type == 'switch':
         # 设置总开关
@@ -80,10 +95,11 @@ def parse_set_command(controller, args):
             switch_cmd = int(value_str)
             if switch_cmd not in [0, 1, 2]:
                 print("错误：开关值必须是0、1或2")
-                return
-            controller.send_control_data(switch_cmd=switch_cmd)
+                return False
+            return controller.send_reliable_command(switch_cmd) is not None
         except ValueError:
             print("错误：开关值必须是整数")
+            return False
             
     elif param_type == 'servo':
         # 设置舵机角度（根据协议要求使用float类型）
@@ -92,16 +108,275 @@ def parse_set_command(controller, args):
             angles = [float(x.strip()) for x in value_str.split(',')]
             if len(angles) != 4:
                 print("错误：必须提供4个舵机角度值")
-                return
-            controller.send_control_data(servo_angles=angles)
+                return False
+            return controller.send_control_data(servo_angles=angles)
         except ValueError:
             print("错误：舵机角度必须是数字")
+            return False
     else:
         print(f"未知参数: {param_type}")
+        return False
+
+def parse_traj_command(controller, args):
+    """解析traj命令，返回命令是否执行成功"""
+    if len(args) < 1:
+        print("用法: traj load <文件> [频率] | traj play | traj stop | traj report [文件]")
+        return False
+
+    action = args[0].lower()
+    if action == 'load':
+        if len(args) < 2:
+            print("用法: traj load <文件> [频率]")
+            return False
+        try:
+            rate = float(args[2]) if len(args) > 2 else None
+        except ValueError:
+            print("错误：频率必须是数字")
+            return False
+        return controller.load_trajectory(args[1], rate)
+    elif action == 'play':
+        return controller.start_trajectory()
+    elif action == 'stop':
+        controller.stop_trajectory()
+    elif action == 'report':
+        controller.trajectory_player.print_report()
+        if len(args) > 1:
+            controller.trajectory_player.save_report(args[1])
+    else:
+        print(f"未知轨迹命令: {action}")
+        return False
+    return True
+
+def parse_archive_command(controller, args):
+    """解析archive命令，返回命令是否执行成功"""
+    if len(args) < 1:
+        print("用法: archive start [文件] [zlib|lzma] | archive stop | archive query <文件> [起始秒 结束秒]")
+        return False
+
+    action = args[0].lower()
+    if action == 'start':
+        path = args[1] if len(args) > 1 else None
+        codec = args[2].lower() if len(args) > 2 else 'zlib'
+        return controller.start_archive(path, codec)
+    elif action == 'stop':
+        controller.stop_archive()
+    elif action == 'query':
+        if len(args) < 2:
+            print("用法: archive query <文件> [起始秒 结束秒]")
+            return False
+        try:
+            start = float(args[2]) if len(args) > 2 else None
+            end = float(args[3]) if len(args) > 3 else None
+        except ValueError:
+            print("错误：时间必须是数字")
+            return False
+        return controller.query_archive(args[1], start, end)
+    else:
+        print(f"未知归档命令: {action}")
+        return False
+    return True
+
+# 可执行的命令关键字，脚本在解析时据此检查
+COMMANDS = {
+    'exit', 'quit', 'a', 'b', 'help', 'list', 'connect', 'disconnect', 'set', 'crc',
+    'auto', 'stop', 'monitor', 'archive', 'traj', 'status', 'dashboard', 'log',
+}
+
+def execute_command(controller, user_input):
+    """
+    解析并执行一条命令
+    Args:
+        controller: CommandControl 控制器实例
+        user_input: str 用户输入的命令行
+    Returns:
+        bool: False表示请求退出程序，否则为True
+    """
+    keep_running, _ = execute_checked(controller, user_input)
+    return keep_running
+
+def execute_checked(controller, user_input):
+    """
+    解析并执行一条命令，同时返回命令是否执行成功（供脚本统计失败的命令）
+    Returns:
+        tuple: (keep_running, ok) keep_running为False表示请求退出程序
+    """
+    # 处理空输入
+    user_input = user_input.strip()
+    if not user_input:
+        return True, True
+
+    ok = True
+
+    try:
+        # 分割命令和参数
+        parts = user_input.split()
+        command = parts[0].lower()
+        args = parts[1:]
+        
+        # 命令解析和执行
+        if command in ['exit', 'quit']:
+            # 退出程序
+            print("正在退出...")
+            controller.cleanup()
+            return False, True
+        elif command == 'b':
+            # 执行预设命令：开关为0（关闭）
+            ok = controller.send_reliable_command(0) is not None
+            print("预设命令已执行：开关=0（关闭")
+        elif command == 'a':
+            # 执行预设命令：开关=1，风扇=1500，舵机=45度
+            ok = controller.send_reliable_command(
+                1,
+                fan_rpm=1500.0,
+                servo_angles=[45.0, 45.0, 45.0, 45.0]
+            ) is not None
+            print("预设命令已执行：开关=1，风扇=1500，舵机=45度")
+            
+        elif command == 'help':
+            # 显示帮助信息
+            show_help()
+            
+        elif command == 'list':
+            # 列出可用串口
+            controller.list_ports()
+            
+        elif command == 'connect':
+            # 连接串口
+            if len(args) < 1:
+                print("用法: connect <端口> [波特率]")
+                return True, False
+                
+            port_name = args[0]
+            baudrate = int(args[1]) if len(args) > 1 else 115200
+            ok = controller.connect_serial(port_name, baudrate)
+            
+        elif command == 'disconnect':
+            # 断开串口连接
+            controller.disconnect_serial()
+            
+        elif command == 'set':
+            # 设置控制参数
+            ok = parse_set_command(controller, args)
+            
+        elif command == 'crc':
+            # 设置校验模式
+            if not args:
+                print(f"当前校验模式: {controller.protocol.crc_mode or '无'}")
+            else:
+                mode = args[0].lower()
+                ok = controller.set_crc_mode(None if mode == 'none' else mode)
+
+        elif command == 'auto':
+            # 启动自动发送
+            interval = float(args[0]) if args else 0.1
+            ok = controller.start_auto_send(interval)
+            
+        elif command == 'stop':
+            # 停止自动发送
+            controller.stop_auto_send()
+            
+        elif command == 'monitor':
+            # 控制台遥测显示
+            if args and args[0].lower() == 'off':
+                controller.stop_monitor()
+            else:
+                rate = float(args[0]) if args else 1.0
+                mode = args[1].lower() if len(args) > 1 else 'last'
+                ok = controller.start_monitor(rate, mode)
+
+        elif command == 'archive':
+            # 遥测归档
+            ok = parse_archive_command(controller, args)
+
+        elif command == 'traj':
+            # 控制轨迹回放
+            ok = parse_traj_command(controller, args)
+
+        elif command == 'status':
+            # 显示状态
+            controller.print_status()
+            
+        elif command == 'dashboard':
+            # 实时仪表盘
+            fps = float(args[0]) if args else 10.0
+            Dashboard(controller, execute_command, fps).run()
+
+        elif command == 'log':
+            # 处理日志命令
+            if len(args) == 0:
+                # log - 显示最近20行
+                controller.show_log(20)
+            elif args[0].lower() == 'clear':
+                # log clear - 清空日志
+                controller.clear_log()
+            elif args[0].lower() == 'info':
+                # log info - 显示日志信息
+                controller.show_log_info()
+            else:
+                # log <行数> - 显示指定行数
+                try:
+                    lines = int(args[0])
+                    controller.show_log(lines)
+                except ValueError:
+                    print("错误：行数必须是数字")
+                    ok = False
+            
+        else:
+            print(f"未知命令: {command}")
+            print("输入 'help' 查看可用命令")
+            ok = False
+
+    except Exception as e:
+        print(f"命令执行错误: {e}")
+        ok = False
+    return True, ok
+
+def run_script(controller, path, fail_fast=False):
+    """
+    非交互模式：按计划时间执行脚本文件（path为'-'时从标准输入读取）
+    Returns:
+        int: 退出码，0表示所有命令成功且断言通过
+    """
+    try:
+        if path == '-':
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        steps = parse_script(lines, COMMANDS)
+    except (OSError, ScriptError) as e:
+        print(f"脚本错误: {e}")
+        return 2
+
+    runner = ScriptRunner(controller, execute_checked)
+    try:
+        passed = runner.run(steps, fail_fast)
+    except KeyboardInterrupt:
+        print("\n接收到中断信号，脚本中止")
+        passed = False
+    runner.print_report()
+    controller.cleanup()
+    return 0 if passed else 1
+
 def main():
     """主函数 - 命令行交互界面"""
+    parser = argparse.ArgumentParser(description="航模地面站 - 命令行控制界面")
+    parser.add_argument('--script', metavar='FILE',
+                        help="非交互模式：按计划时间执行脚本文件，'-'表示从标准输入读取")
+    parser.add_argument('--port', help="启动时连接的串口")
+    parser.add_argument('--baud', type=int, default=115200, help="波特率 (默认115200)")
+    parser.add_argument('--fail-fast', action='store_true', help="脚本中命令失败或断言失败时立即停止")
+    args = parser.parse_args()
+
     # 创建命令行控制器实例
     controller = CommandControl()
+    if args.port and not controller.connect_serial(args.port, args.baud):
+        if args.script:
+            sys.exit(2)
+
+    if args.script:
+        sys.exit(run_script(controller, args.script, args.fail_fast))
+
     # 显示欢迎信息
     show_welcome()
 
@@ -109,98 +384,10 @@ def main():
     while True:
         try:
             # 获取用户输入
-            user_input = input(">>> ").strip()
-            
-            # 处理空输入
-            if not user_input:
-                continue
-                
-            # 分割命令和参数
-            parts = user_input.split()
-            command = parts[0].lower()
-            args = parts[1:]
-            
-            # 命令解析和执行
-            if command in ['exit', 'quit']:
-                # 退出程序
-                print("正在退出...")
-                controller.cleanup()
+            user_input = input(">>> ")
+            if not execute_command(controller, user_input):
                 break
-            elif command == 'b':
-                # 执行预设命令：开关为0（关闭）
-                controller.send_control_data(switch_cmd=0)
-                print("预设命令已执行：开关=0（关闭")
-            elif command == 'a':
-                # 执行预设命令：开关=1，风扇=1500，舵机=45度
-                controller.send_control_data(
-                    switch_cmd=1,
-                    fan_rpm=1500.0,
-                    servo_angles=[45.0, 45.0, 45.0, 45.0]
-                )
-                print("预设命令已执行：开关=1，风扇=1500，舵机=45度")
-                
-            elif command == 'help':
-                # 显示帮助信息
-                show_help()
-                
-            elif command == 'list':
-                # 列出可用串口
-                controller.list_ports()
-                
-            elif command == 'connect':
-                # 连接串口
-                if len(args) < 1:
-                    print("用法: connect <端口> [波特率]")
-                    continue
-                    
-                port_name = args[0]
-                baudrate = int(args[1]) if len(args) > 1 else 115200
-                controller.connect_serial(port_name, baudrate)
-                
-            elif command == 'disconnect':
-                # 断开串口连接
-                controller.disconnect_serial()
-                
-            elif command == 'set':
-                # 设置控制参数
-                parse_set_command(controller, args)
-                
-            elif command == 'auto':
-                # 启动自动发送
-                interval = float(args[0]) if args else 0.1
-                controller.start_auto_send(interval)
-                
-            elif command == 'stop':
-                # 停止自动发送
-                controller.stop_auto_send()
-                
-            elif command == 'status':
-                # 显示状态
-                controller.print_status()
-                
-            elif command == 'log':
-                # 处理日志命令
-                if len(args) == 0:
-                    # log - 显示最近20行
-                    controller.show_log(20)
-                elif args[0].lower() == 'clear':
-                    # log clear - 清空日志
-                    controller.clear_log()
-                elif args[0].lower() == 'info':
-                    # log info - 显示日志信息
-                    controller.show_log_info()
-                else:
-                    # log <行数> - 显示指定行数
-                    try:
-                        lines = int(args[0])
-                        controller.show_log(lines)
-                    except ValueError:
-                        print("错误：行数必须是数字")
-                
-            else:
-                print(f"未知命令: {command}")
-                print("输入 'help' 查看可用命令")
-                
+
         except KeyboardInterrupt:
             # 处理Ctrl+C
             print("\n接收到中断信号，正在退出...")
@@ -1,16 +1,24 @@
 import struct
+import threading
+import numpy as np
+from crc import CRC_SIZES, compute_crc, compute_crc_rows
 
 class Protocol:
     def __init__(self):
         # 上行数据包常量（地面站 → 制导镖）
         self.UP_HEADER = 0xAA
         self.UP_TAIL = 0xBB
-        self.UP_FRAME_SZ = 13  # header(1) + switch(1) + fan_rpm(2) + servo[4](8) + tail(1)  = 13
+        self.UP_BASE_SZ = 13  # header(1) + switch(1) + fan_rpm(2) + servo[4](8) + tail(1)  = 13
+        self.UP_FRAME_SZ = self.UP_BASE_SZ
         
         # 下行数据包常量（制导镖 → 地面站）
         self.DOWN_HEADER = 0xCC
         self.DOWN_TAIL = 0xDD
-        self.DOWN_FRAME_SZ = 39 # header(1) + last_switch(1) + gyro[9](36) + tail(1)  = 39
+        self.DOWN_BASE_SZ = 39 # header(1) + last_switch(1) + gyro[9](36) + tail(1)  = 39
+        self.DOWN_FRAME_SZ = self.DOWN_BASE_SZ
+        # 下行数据转为数组时的列顺序
+        self.GYRO_FIELDS = ['gx', 'gy', 'gz', 'ax', 'ay', 'az', 'mx', 'my', 'mz']
+        self.DOWN_FIELDS = ['last_switch'] + self.GYRO_FIELDS
         
         # 数据包大小配置
         self.data_packet_mode = "full"  # "full" 或 "compact"
@@ -25,9 +33,51 @@ class Protocol:
         self.cmd_off = 0x00
         self.cmd_unlock = 0x02
         
+        # 可选校验：None、"crc8"(CRC-8/MAXIM) 或 "crc16"(CRC-16/CCITT-FALSE)
+        # 校验值附加在帧尾之后，覆盖帧头到帧尾，须与航模固件的设置一致
+        self.crc_mode = None
+        self.crc_size = 0
+        self.crc_errors = 0
+        # 解析时被丢弃的字节数（垃圾数据、伪包头、校验失败的帧），累计值
+        self.discarded_bytes = 0
+
         # 接收缓冲区
         self.receive_buffer = bytearray()
-    
+        # 接收锁：串口线程解析数据与其他线程切换校验模式互斥
+        self.receive_lock = threading.Lock()
+
+    def set_crc_mode(self, mode):
+        """
+        设置收发两个方向的校验模式，数据包长度随之改变
+        Args:
+            mode: None、"crc8" 或 "crc16"
+        Raises:
+            ValueError: 未知的校验模式
+        """
+        if mode not in CRC_SIZES:
+            raise ValueError(f"未知校验模式: {mode}")
+        with self.receive_lock:
+            self.crc_mode = mode
+            self.crc_size = CRC_SIZES[mode]
+            self.UP_FRAME_SZ = self.UP_BASE_SZ + self.crc_size
+            self.DOWN_FRAME_SZ = self.DOWN_BASE_SZ + self.crc_size
+            self.crc_errors = 0
+            # 缓冲区中残留的数据按旧长度组帧，直接丢弃
+            self.discarded_bytes += len(self.receive_buffer)
+            self.receive_buffer.clear()
+
+    def append_crc(self, packet):
+        """在数据包末尾附加校验值（小端序），未启用校验时原样返回"""
+        if self.crc_mode == 'crc8':
+            return packet + struct.pack('<B', compute_crc('crc8', packet))
+        if self.crc_mode == 'crc16':
+            return packet + struct.pack('<H', compute_crc('crc16', packet))
+        return packet
+
+    def _crc_dtype(self):
+        """校验字段的numpy类型"""
+        return 'u1' if self.crc_mode == 'crc8' else '<u2'
+
   
     def encode_up_frame(self, switch_cmd, fan_rpm, servo_angles):
         """
@@ -56,11 +106,68 @@ class Protocol:
                                 servo_angles_int[3],   # 舵机4角度（已转换为整数）
                                 self.UP_TAIL)      # 0xBB
             
-            return packet_without_crc
+            return self.append_crc(packet_without_crc)
         except Exception as e:
             print(f"编码上行数据包错误: {e}")
             return None
 
+    def up_frame_dtype(self):
+        """
+        上行数据包的numpy结构化类型，字段布局与encode_up_frame的struct格式一致
+        Returns:
+            np.dtype: 紧凑排列（无填充）的结构，长度为UP_FRAME_SZ
+        """
+        fields = [
+            ('header', 'u1'),
+            ('switch', 'u1'),
+            ('fan_rpm', '<i2'),
+            ('servo', '<i2', (4,)),
+            ('tail', 'u1'),
+        ]
+        if self.crc_mode:
+            fields.append(('crc', self._crc_dtype()))
+        return np.dtype(fields)
+
+    def encode_up_frames(self, switch_cmds, fan_rpms, servo_angles):
+        """
+        批量编码上行数据包，结果为一段连续缓冲区
+        每一帧与encode_up_frame的输出逐字节相同
+        Args:
+            switch_cmds: array-like (n,) 总开关
+            fan_rpms: array-like (n,) 风扇转速
+            servo_angles: array-like (n, 4) 舵机角度
+        Returns:
+            bytes: n * UP_FRAME_SZ 字节的连续数据
+        Raises:
+            ValueError: 数据形状不一致或数值超出字段范围
+        """
+        switch_cmds = np.asarray(switch_cmds)
+        fan_rpms = np.asarray(fan_rpms)
+        servo_angles = np.asarray(servo_angles)
+        n = len(switch_cmds)
+        if fan_rpms.shape != (n,) or servo_angles.shape != (n, 4):
+            raise ValueError("开关、风扇转速、舵机角度的帧数不一致")
+
+        # 与int()相同，向零截断
+        fan_int = np.trunc(fan_rpms)
+        servo_int = np.trunc(servo_angles)
+        if n and (switch_cmds.min() < 0 or switch_cmds.max() > 0xFF):
+            raise ValueError("开关值超出范围 (0-255)")
+        for name, values in (('风扇转速', fan_int), ('舵机角度', servo_int)):
+            if n and (values.min() < -32768 or values.max() > 32767):
+                raise ValueError(f"{name}超出范围 (-32768-32767)")
+
+        frames = np.empty(n, dtype=self.up_frame_dtype())
+        frames['header'] = self.UP_HEADER
+        frames['switch'] = switch_cmds
+        frames['fan_rpm'] = fan_int
+        frames['servo'] = servo_int
+        frames['tail'] = self.UP_TAIL
+        if self.crc_mode:
+            rows = frames.view(np.uint8).reshape(n, self.UP_FRAME_SZ)
+            frames['crc'] = compute_crc_rows(self.crc_mode, rows[:, :self.UP_BASE_SZ])
+        return frames.tobytes()
+
 
 
     
@@ -75,49 +182,120 @@ class Protocol:
         """
         if not data:
             return []
+
+        # 持有接收锁，避免解析过程中校验模式（帧长度）被切换
+        with self.receive_lock:
+            # 添加到缓冲区
+            buffer = self.receive_buffer
+            buffer.extend(data)
+            size = self.DOWN_FRAME_SZ
         
-        # 添加到缓冲区
-        self.receive_buffer.extend(data)
-        
-        valid_packets = []
+            valid_packets = []
         
-        # 处理缓冲区中的数据
-        while len(self.receive_buffer) >= self.DOWN_FRAME_SZ:
-            # 查找包头
-            header_pos = -1
-            for i in range(len(self.receive_buffer) - self.DOWN_FRAME_SZ + 1):
-                if self.receive_buffer[i] == self.DOWN_HEADER:
-                    header_pos = i
+            # 用偏移量遍历缓冲区，处理完后一次性移除已消费的数据
+            pos = 0
+            while True:
+                # 查找包头
+                header_pos = buffer.find(self.DOWN_HEADER, pos)
+                if header_pos == -1:
+                    # 没有找到包头，丢弃全部数据
+                    pos = len(buffer)
                     break
             
-            if header_pos == -1:
-                # 没有找到有效包头，清空缓冲区
-                self.receive_buffer.clear()
-                break
-            
-            # 移除包头之前的数据
-            if header_pos > 0:
-                self.receive_buffer = self.receive_buffer[header_pos:]
+                if len(buffer) - header_pos < size:
+                    # 数据不完整，保留包头及之后的数据等待更多数据
+                    pos = header_pos
+                    break
             
-            # 检查是否有完整的数据包
-            if len(self.receive_buffer) >= self.DOWN_FRAME_SZ:
-                packet_data = bytes(self.receive_buffer[:self.DOWN_FRAME_SZ])
-                
                 # 尝试解码数据包
-                decoded = self._decode_down_frame_fast(packet_data)
+                decoded = self._decode_down_frame_fast(bytes(buffer[header_pos:header_pos + size]))
                 if decoded is not None:
                     valid_packets.append(decoded)
-                    # 移除已处理的数据
-                    self.receive_buffer = self.receive_buffer[self.DOWN_FRAME_SZ:]
+                    pos = header_pos + size
                 else:
-                    # 解码失败，跳过这个包头
-                    self.receive_buffer = self.receive_buffer[1:]
-            else:
-                # 数据不完整，等待更多数据
-                break
-                
-        return valid_packets
+                    # 伪包头（包尾或校验不符），只跳过这一个字节，不会越过后面的真实数据包
+                    pos = header_pos + 1
+        
+            # 已移除但不属于有效数据包的字节；不完整的数据包留在缓冲区，不计入
+            self.discarded_bytes += pos - len(valid_packets) * size
+            del buffer[:pos]
+            return valid_packets
     
+    def down_frame_dtype(self):
+        """
+        下行数据包的numpy结构化类型，字段布局与_decode_down_frame_fast的struct格式一致
+        Returns:
+            np.dtype: 紧凑排列（无填充）的结构，长度为DOWN_FRAME_SZ
+        """
+        fields = [
+            ('header', 'u1'),
+            ('last_switch', 'u1'),
+            ('gyro', '<f4', (9,)),
+            ('tail', 'u1'),
+        ]
+        if self.crc_mode:
+            fields.append(('crc', self._crc_dtype()))
+        return np.dtype(fields)
+
+    def find_down_frames(self, data):
+        """
+        在一段完整的字节流中定位下行数据包（向量化）
+        与process_receive_data的规则相同：从前往后取包头包尾都匹配的位置，
+        接受一帧后从帧尾之后继续查找
+        Args:
+            data: bytes 原始字节流
+        Returns:
+            np.ndarray: 被接受的数据包起始偏移（升序）
+        """
+        buf = np.frombuffer(data, dtype=np.uint8)
+        size = self.DOWN_FRAME_SZ
+        if len(buf) < size:
+            return np.empty(0, dtype=np.int64)
+
+        # 包头和包尾同时匹配的候选位置
+        tail = self.DOWN_BASE_SZ - 1
+        last = len(buf) - size + 1
+        candidates = np.flatnonzero((buf[:last] == self.DOWN_HEADER) &
+                                    (buf[tail:tail + last] == self.DOWN_TAIL))
+        if self.crc_mode and len(candidates):
+            # 批量校验，剔除伪包头
+            rows = buf[candidates[:, np.newaxis] + np.arange(size)]
+            expected = compute_crc_rows(self.crc_mode, rows[:, :self.DOWN_BASE_SZ])
+            stored = rows[:, self.DOWN_BASE_SZ].astype(np.uint16)
+            if self.crc_size == 2:
+                stored |= rows[:, self.DOWN_BASE_SZ + 1].astype(np.uint16) << 8
+            valid = expected == stored
+            self.crc_errors += int(np.count_nonzero(~valid))
+            candidates = candidates[valid]
+        if len(candidates) == 0 or np.all(np.diff(candidates) >= size):
+            # 候选互不重叠（干净的数据流），全部接受
+            return candidates
+
+        # 存在重叠的候选（伪包头），按贪心规则跳转，只在候选之间循环
+        next_index = np.searchsorted(candidates, candidates + size)
+        accepted = []
+        i = 0
+        while i < len(candidates):
+            accepted.append(i)
+            i = next_index[i]
+        return candidates[accepted]
+
+    def decode_down_frames(self, data):
+        """
+        批量解码一段字节流中的所有下行数据包
+        Args:
+            data: bytes 原始字节流
+        Returns:
+            tuple: (frames, starts)
+                frames: np.ndarray 结构化数组，类型见down_frame_dtype
+                starts: np.ndarray 每帧在字节流中的起始偏移
+        """
+        starts = self.find_down_frames(data)
+        buf = np.frombuffer(data, dtype=np.uint8)
+        rows = buf[starts[:, np.newaxis] + np.arange(self.DOWN_FRAME_SZ)]
+        frames = np.ascontiguousarray(rows).view(self.down_frame_dtype()).reshape(len(starts))
+        return frames, starts
+
     def _decode_down_frame_fast(self, data):
         """
         解码下行数据包（制导镖 → 地面站）
@@ -131,15 +309,23 @@ class Protocol:
             return None
         
         try:
-            # 解析39字节数据包
+            # 解析39字节数据包（启用校验时后接1或2字节校验值）
             # header(1) + last_switch(1) + gyro[9](36) + tail(1) = 39
             # 格式：1字节header + 1字节last_switch + 9个float(每个4字节) + 1字节tail
             header, last_switch, gx, gy, gz, ax, ay, az, mx, my, mz, tail = \
-                struct.unpack('<B B 9f B', data)
+                struct.unpack_from('<B B 9f B', data)
             
             # 验证包头包尾
             if header != self.DOWN_HEADER or tail != self.DOWN_TAIL:
                 return None
+
+            # 验证校验值
+            if self.crc_mode:
+                body = data[:self.DOWN_BASE_SZ]
+                stored = int.from_bytes(data[self.DOWN_BASE_SZ:], 'little')
+                if compute_crc(self.crc_mode, body) != stored:
+                    self.crc_errors += 1
+                    return None
             
             return {
                 'last_switch': last_switch,
@@ -152,3 +338,18 @@ class Protocol:
         except Exception as e:
             print(f"解码下行数据包错误: {e}")
             return None
+
+    def packets_to_array(self, packets):
+        """
+        将process_receive_data解析出的数据包列表转为二维数组
+        Args:
+            packets: list 解码后的数据包字典
+        Returns:
+            np.ndarray: (n, 10) float64数组，列顺序见DOWN_FIELDS
+        """
+        rows = np.empty((len(packets), len(self.DOWN_FIELDS)), dtype=np.float64)
+        for i, packet in enumerate(packets):
+            gyro = packet['gyro_data']
+            rows[i, 0] = packet['last_switch']
+            rows[i, 1:] = [gyro[name] for name in self.GYRO_FIELDS]
+        return rows
@@ -0,0 +1,226 @@
+import time
+import threading
+from collections import deque
+
+
+class PendingCommand:
+    """一条待确认的开关命令"""
+
+    def __init__(self, switch_cmd, baseline=None):
+        self.switch_cmd = switch_cmd
+        # 提交时最近一次观测到的last_switch，None表示尚未收到数据
+        self.baseline = baseline
+        # 发送后观测到了不等于目标值的last_switch
+        self.seen_other = False
+        # 提交时替代了尚未确认的旧命令，观测到的跳变可能来自旧命令
+        self.replaced_pending = False
+        self.created_at = time.monotonic()
+        self.first_sent_at = None
+        self.last_sent_at = None
+        self.transmissions = 0
+        self.acked_at = None
+        self.failed = False
+        # 被更新的开关命令替代（未确认即作废）
+        self.superseded = False
+        # 当前重传超时，每次重传加倍
+        self.timeout = None
+        self.done = threading.Event()
+
+    @property
+    def latency(self):
+        """从首次发送到收到确认的时间，单位秒"""
+        if self.acked_at is None or self.first_sent_at is None:
+            return None
+        return self.acked_at - self.first_sent_at
+
+
+class ReliableCommandChannel:
+    """
+    可靠命令通道 - 以下行数据中的last_switch作为确认，超时重传
+    开关是状态而不是事件序列：通道中只有一条当前命令，新命令立即替代尚未确认的旧命令
+    （重传计数从零开始），关闭命令不会排在未确认的命令之后
+    重传超时按RFC 6298由实测往返时间自适应计算，重传的命令不参与RTT采样（Karn算法）
+    目标值与航模当前的last_switch相同时，回传的值无法区分是否来自本命令：
+    这类命令在发送后观测到跳变，或等待一个往返时间后仍为目标值才确认，且不参与RTT采样
+    """
+
+    def __init__(self, encode_frame, send_priority, max_retries=10):
+        """
+        Args:
+            encode_frame: callable(switch_cmd) 生成携带该开关值的完整上行数据包
+            send_priority: callable(bytes) 以高优先级发送数据包
+            max_retries: int 最大重传次数，超过后放弃该命令
+        """
+        self.encode_frame = encode_frame
+        self.send_priority = send_priority
+        self.max_retries = max_retries
+
+        # 往返时间估计
+        self.initial_rto = 0.2
+        self.min_rto = 0.02
+        self.max_rto = 1.0
+        self.srtt = None
+        self.rttvar = None
+        self.rto = self.initial_rto
+
+        self.current = None
+        # 最近一次观测到的last_switch（来自下行数据）
+        self.last_observed_switch = None
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+        # 统计
+        self.delivered = 0
+        self.failed = 0
+        self.superseded = 0
+        self.retransmissions = 0
+        self.latencies = deque(maxlen=100)
+
+    def start(self):
+        """启动重传线程"""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止重传线程，未确认的命令被丢弃"""
+        with self.condition:
+            self.running = False
+            self.current = None
+            self.last_observed_switch = None
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def send_command(self, switch_cmd):
+        """
+        提交一条开关命令，替代尚未确认的旧命令并立即发送
+        Returns:
+            PendingCommand: 可通过done事件等待投递结果
+        """
+        with self.condition:
+            command = PendingCommand(switch_cmd, self.last_observed_switch)
+            previous = self.current
+            if previous is not None:
+                command.replaced_pending = True
+                previous.superseded = True
+                self.superseded += 1
+            self.current = command
+            self.condition.notify_all()
+        if previous is not None:
+            previous.done.set()
+        return command
+
+    def on_telemetry(self, last_switches, received_at=None):
+        """
+        处理收到的下行数据，检查是否确认了当前命令
+        Args:
+            last_switches: 一批数据包中的last_switch值
+            received_at: float 接收时间（time.monotonic），默认为当前时间
+        """
+        if len(last_switches) == 0:
+            return
+        received_at = received_at if received_at is not None else time.monotonic()
+        with self.condition:
+            command = self.current
+            self.last_observed_switch = int(last_switches[-1])
+            # 只有发送之后的读取才可能是确认
+            if command is None or command.first_sent_at is None or received_at <= command.first_sent_at:
+                return
+            target = command.switch_cmd
+            # 提交时航模已处于目标状态，回传的目标值可能早于命令到达
+            ambiguous = command.baseline is None or command.baseline == target
+            acked = False
+            for value in last_switches:
+                if int(value) != target:
+                    command.seen_other = True
+                elif not ambiguous or command.seen_other:
+                    # 观测到跳变到目标值
+                    acked = True
+                    break
+            if not acked and ambiguous and int(last_switches[-1]) == target:
+                # 没有跳变：等待一个往返时间（尚无估计时为半个重传超时），
+                # 期间仍为目标值说明之前在途的命令没有改变状态
+                settle = self.srtt if self.srtt is not None else self.rto / 2
+                acked = received_at - command.first_sent_at >= settle
+            if not acked:
+                return
+
+            command.acked_at = received_at
+            # Karn算法：只用未重传的命令更新RTT；状态未变化或替代了在途旧命令时，
+            # 无法确定确认来自本命令，同样不采样
+            if command.transmissions == 1 and not ambiguous and not command.replaced_pending:
+                self._update_rtt(received_at - command.first_sent_at)
+            self.delivered += 1
+            self.latencies.append(command.latency)
+            self.current = None
+            self.condition.notify_all()
+        command.done.set()
+        retries = command.transmissions - 1
+        print(f"命令已确认: 开关={command.switch_cmd}，延迟 {command.latency * 1000:.1f}ms"
+              + (f"（重传{retries}次）" if retries else ""))
+
+    def _update_rtt(self, sample):
+        """按RFC 6298更新平滑RTT和重传超时"""
+        if self.srtt is None:
+            self.srtt = sample
+            self.rttvar = sample / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - sample)
+            self.srtt = 0.875 * self.srtt + 0.125 * sample
+        self.rto = min(self.max_rto, max(self.min_rto, self.srtt + 4 * self.rttvar))
+
+    def _transmit(self, command):
+        """发送（或重传）当前命令"""
+        now = time.monotonic()
+        if command.first_sent_at is None:
+            command.first_sent_at = now
+        command.last_sent_at = now
+        command.transmissions += 1
+        self.send_priority(self.encode_frame(command.switch_cmd))
+
+    def _worker(self):
+        """重传线程：立即发送新的当前命令，超时未确认则指数退避重传"""
+        with self.condition:
+            while self.running:
+                command = self.current
+                if command is None:
+                    self.condition.wait()
+                    continue
+                if command.transmissions == 0:
+                    command.timeout = self.rto
+                    self._transmit(command)
+                    continue
+
+                remaining = command.last_sent_at + command.timeout - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+
+                if command.transmissions > self.max_retries:
+                    self.failed += 1
+                    command.failed = True
+                    self.current = None
+                    command.done.set()
+                    print(f"命令未确认: 开关={command.switch_cmd}，已重传{command.transmissions - 1}次，放弃")
+                    continue
+
+                # 超时：重传并加倍超时时间
+                self.retransmissions += 1
+                command.timeout = min(self.max_rto, command.timeout * 2)
+                self._transmit(command)
+
+    def print_stats(self):
+        """打印命令通道统计"""
+        srtt = f"{self.srtt * 1000:.1f}ms" if self.srtt is not None else "--"
+        print(f"  命令通道: 已确认 {self.delivered}条，失败 {self.failed}条，"
+              f"重传 {self.retransmissions}次，被替代 {self.superseded}条")
+        print(f"    RTT: {srtt}，重传超时: {self.rto * 1000:.1f}ms")
+        if self.latencies:
+            latencies = list(self.latencies)
+            print(f"    投递延迟: 平均 {sum(latencies) / len(latencies) * 1000:.1f}ms，"
+                  f"最大 {max(latencies) * 1000:.1f}ms")
@@ -0,0 +1,255 @@
+import time
+import operator
+
+
+# assert支持的比较运算
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge,
+}
+
+
+class ScriptError(Exception):
+    """脚本语法错误"""
+
+    def __init__(self, lineno, message):
+        super().__init__(f"第{lineno}行: {message}")
+        self.lineno = lineno
+
+
+class ScriptStep:
+    """展开后的一个脚本步骤"""
+
+    def __init__(self, kind, lineno, text, scheduled=0.0, payload=None):
+        self.kind = kind            # 'command' 或 'assert'
+        self.lineno = lineno
+        self.text = text
+        self.scheduled = scheduled  # 相对脚本开始的计划时间，单位秒
+        self.payload = payload
+        self.started = None         # 实际开始时间（相对脚本开始）
+        self.passed = None          # assert结果，或命令是否执行成功
+
+
+def parse_script(lines, commands=None):
+    """
+    解析脚本文本，展开repeat块并计算每一步的计划时间
+    语法（每行一条，#开头为注释）:
+        <命令>                       与交互界面相同的命令
+        wait <秒>                    计划时间向后推移
+        at <秒>                      计划时间设为相对脚本开始的绝对时刻，不能早于当前计划时间，
+                                     不能出现在repeat块内
+        repeat <次数> ... end        重复执行块内内容，可嵌套
+        assert <字段> <运算> <值> [within <秒>]
+                                     检查遥测/状态，within为等待条件成立的最长时间
+    Args:
+        lines: list 脚本的各行
+        commands: set 允许的命令关键字，None表示不检查
+    Returns:
+        list: ScriptStep列表，按计划时间顺序排列
+    Raises:
+        ScriptError: 语法错误
+    """
+    ops, _ = _parse_block(lines, 0, commands, top_level=True)
+
+    steps = []
+    cursor = 0.0
+    for kind, lineno, text, value in _expand(ops):
+        if kind == 'wait':
+            cursor += value
+        elif kind == 'at':
+            if value < cursor:
+                raise ScriptError(lineno, f"at {value:g}早于当前计划时间 {cursor:g}秒")
+            cursor = value
+        else:
+            steps.append(ScriptStep(kind, lineno, text, cursor, value))
+    return steps
+
+
+def _parse_number(lineno, text, name):
+    try:
+        value = float(text)
+    except ValueError:
+        raise ScriptError(lineno, f"{name}必须是数字: {text}")
+    if value < 0:
+        raise ScriptError(lineno, f"{name}不能为负数: {text}")
+    return value
+
+
+def _parse_block(lines, index, commands, top_level=False):
+    """解析到对应的end（或文件结束）为止，返回 (操作列表, 下一行下标)"""
+    ops = []
+    while index < len(lines):
+        lineno = index + 1
+        text = lines[index].split('#', 1)[0].strip()
+        index += 1
+        if not text:
+            continue
+        parts = text.split()
+        keyword = parts[0].lower()
+
+        if keyword == 'end':
+            if top_level:
+                raise ScriptError(lineno, "多余的end")
+            return ops, index
+        elif keyword == 'repeat':
+            if len(parts) != 2 or not parts[1].isdigit():
+                raise ScriptError(lineno, "用法: repeat <次数>")
+            body, index = _parse_block(lines, index, commands)
+            ops.append(('repeat', lineno, text, (int(parts[1]), body)))
+        elif keyword in ('wait', 'at'):
+            if keyword == 'at' and not top_level:
+                raise ScriptError(lineno, "repeat块内不能使用at，请用wait")
+            if len(parts) != 2:
+                raise ScriptError(lineno, f"用法: {keyword} <秒>")
+            ops.append((keyword, lineno, text, _parse_number(lineno, parts[1], "时间")))
+        elif keyword == 'assert':
+            ops.append(('assert', lineno, text, _parse_assert(lineno, parts[1:])))
+        else:
+            if commands is not None and keyword not in commands:
+                raise ScriptError(lineno, f"未知命令: {parts[0]}")
+            ops.append(('command', lineno, text, None))
+
+    if not top_level:
+        raise ScriptError(len(lines), "repeat缺少对应的end")
+    return ops, index
+
+
+def _parse_assert(lineno, parts):
+    """解析 assert <字段> <运算> <值> [within <秒>]"""
+    within = 0.0
+    if len(parts) == 5 and parts[3].lower() == 'within':
+        within = _parse_number(lineno, parts[4], "等待时间")
+        parts = parts[:3]
+    if len(parts) != 3 or parts[1] not in OPERATORS:
+        raise ScriptError(lineno, "用法: assert <字段> <==|!=|<|<=|>|>=> <值> [within <秒>]")
+    field, op, value = parts
+    try:
+        value = float(value)
+    except ValueError:
+        raise ScriptError(lineno, f"比较值必须是数字: {value}")
+    return field, op, value, within
+
+
+def _expand(ops):
+    """展开repeat块"""
+    for kind, lineno, text, value in ops:
+        if kind == 'repeat':
+            count, body = value
+            for _ in range(count):
+                yield from _expand(body)
+        else:
+            yield kind, lineno, text, value
+
+
+class ScriptRunner:
+    """脚本执行器 - 按计划时间对同一个CommandControl执行命令和断言"""
+
+    def __init__(self, controller, execute):
+        """
+        Args:
+            controller: CommandControl 控制器实例
+            execute: callable(controller, line) 命令执行函数，
+                返回 (keep_running, ok)，keep_running为False表示请求退出，ok表示命令是否执行成功
+        """
+        self.controller = controller
+        self.execute = execute
+        # 提前唤醒后忙等的时间窗口，单位秒
+        self.spin_window = 0.002
+        # assert等待条件成立时的轮询间隔，单位秒
+        self.poll_interval = 0.005
+        self.steps = []
+
+    def read_field(self, field):
+        """读取assert中使用的字段：遥测值、快照字段或统计计数"""
+        snapshot = self.controller.get_snapshot()
+        if snapshot.telemetry is not None and field in snapshot.telemetry:
+            return snapshot.telemetry[field]
+        if field in snapshot._fields and field != 'telemetry':
+            return getattr(snapshot, field)
+        if field == 'crc_errors':
+            return self.controller.protocol.crc_errors
+        if field == 'commands_delivered':
+            return self.controller.command_channel.delivered
+        if field == 'commands_failed':
+            return self.controller.command_channel.failed
+        return None
+
+    def _wait_until(self, deadline):
+        """先休眠再忙等到截止时刻"""
+        remaining = deadline - time.perf_counter()
+        if remaining > self.spin_window:
+            time.sleep(remaining - self.spin_window)
+        while time.perf_counter() < deadline:
+            pass
+
+    def _check(self, step):
+        """执行assert，在within时间内轮询直到条件成立"""
+        field, op, expected, within = step.payload
+        compare = OPERATORS[op]
+        deadline = time.perf_counter() + within
+        while True:
+            actual = self.read_field(field)
+            if actual is not None and compare(float(actual), expected):
+                return True, actual
+            if time.perf_counter() >= deadline:
+                return False, actual
+            time.sleep(self.poll_interval)
+
+    def run(self, steps, fail_fast=False):
+        """
+        执行脚本步骤
+        Returns:
+            bool: 所有命令是否执行成功且所有assert通过
+        """
+        self.steps = steps
+        start = time.perf_counter()
+        all_passed = True
+        for step in steps:
+            self._wait_until(start + step.scheduled)
+            step.started = time.perf_counter() - start
+
+            if step.kind == 'assert':
+                step.passed, actual = self._check(step)
+                if step.passed:
+                    print(f"[{step.started:8.3f}s] 断言通过: {step.text} (实际值 {actual})")
+                else:
+                    all_passed = False
+                    print(f"[{step.started:8.3f}s] 断言失败: 第{step.lineno}行 {step.text} (实际值 {actual})")
+                    if fail_fast:
+                        break
+            else:
+                keep_running, step.passed = self.execute(self.controller, step.text)
+                if not step.passed:
+                    all_passed = False
+                    print(f"[{step.started:8.3f}s] 命令失败: 第{step.lineno}行 {step.text}")
+                    if fail_fast:
+                        break
+                if not keep_running:
+                    break
+        return all_passed
+
+    def print_report(self):
+        """打印各步骤相对计划时间的偏差"""
+        executed = [step for step in self.steps if step.started is not None]
+        if not executed:
+            print("脚本没有执行任何步骤")
+            return
+        print("\n脚本执行报告:")
+        print(f"  {'行号':>4} {'计划(s)':>9} {'偏差(ms)':>9}  内容")
+        for step in executed:
+            late = (step.started - step.scheduled) * 1000
+            result = "" if step.passed else " [失败]"
+            if step.kind == 'assert' and step.passed:
+                result = " [通过]"
+            print(f"  {step.lineno:4d} {step.scheduled:9.3f} {late:9.3f}  {step.text}{result}")
+
+        late_ms = [(step.started - step.scheduled) * 1000 for step in executed]
+        asserts = [step for step in executed if step.kind == 'assert']
+        failed = sum(1 for step in asserts if not step.passed)
+        commands = [step for step in executed if step.kind == 'command']
+        failed_commands = sum(1 for step in commands if not step.passed)
+        print(f"  已执行 {len(executed)}/{len(self.steps)} 步，"
+              f"偏差 平均 {sum(late_ms) / len(late_ms):.3f}ms，最大 {max(late_ms):.3f}ms")
+        print(f"  命令: {len(commands) - failed_commands}成功，{failed_commands}失败")
+        print(f"  断言: {len(asserts) - failed}通过，{failed}失败")
@@ -8,8 +8,24 @@ class SerialThread:
     
     def __init__(self):
         self.serial_initializer = SerialInitializer()
-        self.send_queue = queue.Queue()
-        self.receive_queue = queue.Queue()
+        # 队列均有上限，长时间运行时内存不会无限增长
+        self.send_queue = queue.Queue(maxsize=256)
+        # 每轮循环最多发送的普通数据包数，积压时几轮即可清空而不是每轮只发一个
+        self.max_send_per_tick = 32
+        # 发送队列已满时丢弃的数据包数，按间隔汇总打印
+        self.send_dropped = 0
+        self.send_dropped_reported = 0
+        self.last_drop_report = 0.0
+        # 高优先级发送队列（关键命令），每轮循环先于普通队列清空
+        self.priority_queue = queue.Queue()
+        # 有高优先级数据时唤醒线程，不必等到本轮休眠结束
+        self.wakeup = threading.Event()
+        # 串口写锁：本线程与send_data_direct（轨迹回放线程）共用，保证数据包不交错
+        self.write_lock = threading.Lock()
+        # 接收队列只供receive_data轮询使用，调用enable_receive_queue后才写入，满了丢弃最旧的数据
+        self.receive_queue = queue.Queue(maxsize=256)
+        self.receive_queue_enabled = False
+        self.receive_dropped = 0
         self.running = False
         self.thread = None
         self.callbacks = []
@@ -34,19 +50,29 @@ class SerialThread:
         """串口线程主循环"""
         while self.running:
             try:
-                # 处理发送队列
-                if not self.send_queue.empty():
-                    data = self.send_queue.get_nowait()
+                # 先发送全部高优先级数据
+                self._send_priority_queue()
+
+                # 处理发送队列：每轮最多发送max_send_per_tick个，期间到达的高优先级数据插队
+                for _ in range(self.max_send_per_tick):
+                    try:
+                        data = self.send_queue.get_nowait()
+                    except queue.Empty:
+                        break
                     if data and self.serial_initializer.is_connected():
-                        success = self.serial_initializer.send_data(data)
+                        with self.write_lock:
+                            success = self.serial_initializer.send_data(data)
                         if not success:
                             print("发送数据失败")
+                    self._send_priority_queue()
                 
-                # 处理接收数据
-                if self.serial_initializer.is_connected():
-                    received_data = self.serial_initializer.receive_data(1024)
+                # 处理接收数据：只读取已到达的字节，避免阻塞到读超时而延误发送
+                waiting = self.serial_initializer.bytes_waiting()
+                if waiting:
+                    received_data = self.serial_initializer.receive_data(waiting)
                     if received_data:
-                        self.receive_queue.put(received_data)
+                        if self.receive_queue_enabled:
+                            self._put_received(received_data)
                         # 通知回调函数
                         for callback in self.callbacks:
                             try:
@@ -54,22 +80,85 @@ class SerialThread:
                             except Exception as e:
                                 print(f"回调函数执行错误: {e}")
                 
-                # 短暂休眠以避免过度占用CPU
-                time.sleep(0.01)  # 10ms
+                # 短暂休眠以避免过度占用CPU，有高优先级数据时立即醒来
+                self.wakeup.wait(0.01)  # 10ms
+                self.wakeup.clear()
                 
             except Exception as e:
                 print(f"串口线程错误: {e}")
                 time.sleep(0.1)
                 
+    def _send_priority_queue(self):
+        """发送全部高优先级数据"""
+        while True:
+            try:
+                data = self.priority_queue.get_nowait()
+            except queue.Empty:
+                return
+            if data and self.serial_initializer.is_connected():
+                with self.write_lock:
+                    success = self.serial_initializer.send_data(data)
+                if not success:
+                    print("发送高优先级数据失败")
+
+    def _put_received(self, data):
+        """放入接收队列，队列已满时丢弃最旧的一块"""
+        while True:
+            try:
+                self.receive_queue.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self.receive_queue.get_nowait()
+                    self.receive_dropped += 1
+                except queue.Empty:
+                    pass
+
     def send_data(self, data):
         """发送数据（线程安全）"""
         if self.running and data:
-            self.send_queue.put(data)
+            try:
+                self.send_queue.put_nowait(data)
+            except queue.Full:
+                # 丢包只计数，每秒最多打印一次汇总，避免持续积压时刷屏
+                self.send_dropped += 1
+                now = time.monotonic()
+                if now - self.last_drop_report >= 1.0:
+                    self.last_drop_report = now
+                    dropped = self.send_dropped - self.send_dropped_reported
+                    self.send_dropped_reported = self.send_dropped
+                    print(f"发送队列已满，已丢弃{dropped}个数据包（累计{self.send_dropped}个）")
+                return False
             return True
         return False
         
+    def send_priority(self, data):
+        """以高优先级发送数据（线程安全），先于普通发送队列"""
+        if self.running and data:
+            self.priority_queue.put(data)
+            self.wakeup.set()
+            return True
+        return False
+
+    def send_data_direct(self, data):
+        """直接写入串口，绕过发送队列（用于需要精确时序的发送）"""
+        if data and self.serial_initializer.is_connected():
+            with self.write_lock:
+                return self.serial_initializer.send_data(data)
+        return False
+
+    def enable_receive_queue(self, enabled=True):
+        """启用（或停用）接收队列，供需要用receive_data轮询的调用方使用；停用时清空队列"""
+        self.receive_queue_enabled = enabled
+        if not enabled:
+            while True:
+                try:
+                    self.receive_queue.get_nowait()
+                except queue.Empty:
+                    break
+
     def receive_data(self):
-        """接收数据（线程安全）"""
+        """接收数据（线程安全），需先调用enable_receive_queue"""
         try:
             return self.receive_queue.get_nowait()
         except queue.Empty:
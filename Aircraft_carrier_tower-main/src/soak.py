@@ -0,0 +1,250 @@
+"""
+内存与线程长时间运行测试
+
+用法:
+    python src/soak.py [--duration 秒] [--rate 帧每秒] [--rss-budget MB] ...
+
+在伪终端(pty)上模拟高速率回传的航模，运行完整的CommandControl（自动发送、
+可靠命令、日志、降采样），定期采样RSS、tracemalloc、队列深度和线程数。
+预热结束后的增长超过预算则测试失败（退出码1）。仅支持Linux/macOS。
+"""
+import os
+import sys
+import csv
+import time
+import struct
+import select
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+from command import CommandControl
+
+
+class FakeAircraft:
+    """伪终端另一端的模拟航模：按固定速率回传下行数据包，last_switch回显收到的开关值"""
+
+    def __init__(self, master_fd, rate, protocol):
+        self.master_fd = master_fd
+        self.rate = rate
+        self.protocol = protocol
+        self.last_switch = 0
+        self.sent_frames = 0
+        self.received_bytes = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def _frame(self, i):
+        phase = i * 0.001
+        return self.protocol.append_crc(struct.pack(
+            '<B B 9f B', self.protocol.DOWN_HEADER, self.last_switch,
+            phase, -phase, 0.5, 0.0, 0.0, 9.8, 30.0, -12.0, 45.0,
+            self.protocol.DOWN_TAIL))
+
+    def _run(self):
+        uplink = bytearray()
+        size = self.protocol.UP_FRAME_SZ
+        start = time.monotonic()
+        while self.running:
+            # 读取并解析地面站发来的上行数据包
+            readable, _, _ = select.select([self.master_fd], [], [], 0.001)
+            if readable:
+                try:
+                    data = os.read(self.master_fd, 4096)
+                except OSError:
+                    break
+                self.received_bytes += len(data)
+                uplink.extend(data)
+                while len(uplink) >= size:
+                    pos = uplink.find(self.protocol.UP_HEADER)
+                    if pos < 0:
+                        uplink.clear()
+                        break
+                    del uplink[:pos]
+                    if len(uplink) < size:
+                        break
+                    if uplink[self.protocol.UP_BASE_SZ - 1] == self.protocol.UP_TAIL:
+                        self.last_switch = uplink[1]
+                        del uplink[:size]
+                    else:
+                        del uplink[:1]
+
+            # 补发到当前时刻为止应发送的所有帧
+            due = int((time.monotonic() - start) * self.rate)
+            if due > self.sent_frames:
+                count = min(due - self.sent_frames, 256)
+                payload = b''.join(self._frame(self.sent_frames + i) for i in range(count))
+                try:
+                    os.write(self.master_fd, payload)
+                except OSError:
+                    break
+                self.sent_frames += count
+
+
+def read_rss():
+    """返回当前进程常驻内存，单位字节"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # 无/proc时退化为峰值RSS（macOS单位为字节，Linux为KB）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def take_sample(controller, aircraft, started):
+    """采集一次资源使用情况"""
+    traced, _ = tracemalloc.get_traced_memory()
+    serial_thread = controller.serial_thread
+    return {
+        'elapsed': time.monotonic() - started,
+        'rss': read_rss(),
+        'traced': traced,
+        'send_queue': serial_thread.send_queue.qsize(),
+        'priority_queue': serial_thread.priority_queue.qsize(),
+        'send_dropped': serial_thread.send_dropped,
+        'threads': threading.active_count(),
+        'frames_sent': aircraft.sent_frames,
+        'frames_received': controller.frame_count,
+    }
+
+
+def main(argv=None):
+    """长时间运行测试入口"""
+    parser = argparse.ArgumentParser(description="CommandControl内存与线程长时间运行测试")
+    parser.add_argument('--duration', type=float, default=600.0, help="运行时长，单位秒 (默认600)")
+    parser.add_argument('--rate', type=float, default=1000.0, help="模拟回传速率，帧/秒 (默认1000)")
+    parser.add_argument('--interval', type=float, default=10.0, help="采样间隔，单位秒 (默认10)")
+    parser.add_argument('--warmup', type=float, default=30.0, help="预热时长，之后的增长计入预算 (默认30)")
+    parser.add_argument('--rss-budget', type=float, default=20.0, help="RSS增长预算，MB (默认20)")
+    parser.add_argument('--traced-budget', type=float, default=10.0,
+                        help="tracemalloc跟踪内存增长预算，MB (默认10)")
+    parser.add_argument('--queue-budget', type=int, default=64, help="队列深度增长预算 (默认64)")
+    parser.add_argument('--thread-budget', type=int, default=0, help="线程数增长预算 (默认0)")
+    parser.add_argument('--command-interval', type=float, default=1.0,
+                        help="可靠开关命令的发送间隔，单位秒 (默认1.0，0为不发送)")
+    parser.add_argument('--top', type=int, default=10, help="显示增长最多的分配位置数 (默认10)")
+    parser.add_argument('--crc', choices=['crc8', 'crc16'], default=None, help="收发校验模式 (默认无校验)")
+    parser.add_argument('--csv', help="将采样结果保存为CSV")
+    args = parser.parse_args(argv)
+
+    try:
+        import pty
+        import tty
+        master_fd, slave_fd = pty.openpty()
+        tty.setraw(slave_fd)
+        port_name = os.ttyname(slave_fd)
+    except (ImportError, OSError) as e:
+        print(f"无法创建伪终端（仅支持Linux/macOS）: {e}")
+        return 2
+
+    tracemalloc.start()
+    controller = CommandControl()
+    controller.protocol.set_crc_mode(args.crc)
+    log_dir = tempfile.mkdtemp(prefix='soak_')
+    controller.log_file_path = os.path.join(log_dir, 'receive_log.txt')
+    aircraft = FakeAircraft(master_fd, args.rate, controller.protocol)
+    aircraft.start()
+
+    if not controller.connect_serial(port_name):
+        aircraft.stop()
+        return 2
+    controller.start_auto_send(0.02)
+
+    samples = []
+    baseline = None
+    baseline_snapshot = None
+    started = time.monotonic()
+    next_sample = started
+    next_command = started + args.command_interval
+    switch_cmd = 0
+    print(f"开始运行 {args.duration:g}秒，回传速率 {args.rate:g}帧/秒，预热 {args.warmup:g}秒")
+    print(f"{'时间(s)':>8} {'RSS(MB)':>9} {'跟踪(MB)':>9} {'发送队列':>8} "
+          f"{'优先队列':>8} {'线程':>4} {'接收帧':>10}")
+    try:
+        while True:
+            now = time.monotonic()
+            if now - started >= args.duration:
+                break
+            if args.command_interval > 0 and now >= next_command:
+                switch_cmd = 1 - switch_cmd
+                controller.send_reliable_command(switch_cmd)
+                next_command += args.command_interval
+            if now >= next_sample:
+                sample = take_sample(controller, aircraft, started)
+                samples.append(sample)
+                print(f"{sample['elapsed']:8.1f} {sample['rss'] / 2**20:9.2f} "
+                      f"{sample['traced'] / 2**20:9.2f} {sample['send_queue']:8d} "
+                      f"{sample['priority_queue']:8d} {sample['threads']:4d} {sample['frames_received']:10d}")
+                if baseline is None and sample['elapsed'] >= args.warmup:
+                    baseline = sample
+                    baseline_snapshot = tracemalloc.take_snapshot()
+                next_sample += args.interval
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        print("\n接收到中断信号，提前结束")
+
+    final = take_sample(controller, aircraft, started)
+    samples.append(final)
+    final_snapshot = tracemalloc.take_snapshot()
+    controller.cleanup()
+    aircraft.stop()
+    os.close(master_fd)
+    os.close(slave_fd)
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(final.keys()))
+            writer.writeheader()
+            writer.writerows(samples)
+        print(f"采样结果已保存到 {args.csv}")
+
+    print("-" * 60)
+    if baseline is None:
+        print("运行时间短于预热时长，无法判定增长")
+        return 2
+
+    # 队列深度按预热后的峰值判定，单次采样可能恰好落在队列刚清空时
+    after = [s for s in samples if s['elapsed'] >= baseline['elapsed']]
+    send_queue_growth = max(s['send_queue'] for s in after) - baseline['send_queue']
+    priority_queue_growth = max(s['priority_queue'] for s in after) - baseline['priority_queue']
+    rss_growth = (final['rss'] - baseline['rss']) / 2**20
+    traced_growth = (final['traced'] - baseline['traced']) / 2**20
+    checks = [
+        ("RSS增长", rss_growth, args.rss_budget, "MB"),
+        ("跟踪内存增长", traced_growth, args.traced_budget, "MB"),
+        ("发送队列增长", send_queue_growth, args.queue_budget, ""),
+        ("高优先级队列增长", priority_queue_growth, args.queue_budget, ""),
+        ("发送丢包", final['send_dropped'] - baseline['send_dropped'], 0, ""),
+        ("线程数增长", final['threads'] - baseline['threads'], args.thread_budget, ""),
+    ]
+    print(f"接收帧: {final['frames_received']}/{final['frames_sent']}")
+    passed = True
+    for name, value, budget, unit in checks:
+        ok = value <= budget
+        passed &= ok
+        print(f"  {name}: {value:.2f}{unit} (预算 {budget}{unit}) {'通过' if ok else '失败'}")
+
+    print(f"\n增长最多的{args.top}个分配位置（预热后）:")
+    for stat in final_snapshot.compare_to(baseline_snapshot, 'lineno')[:args.top]:
+        print(f"  {stat}")
+
+    print("-" * 60)
+    print("测试通过" if passed else "测试失败：资源增长超出预算")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
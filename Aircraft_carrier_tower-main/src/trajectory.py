@@ -0,0 +1,256 @@
+import os
+import time
+import threading
+import numpy as np
+
+
+class TrajectoryPlayer:
+    """控制轨迹回放器 - 按预定时间表发送预先编码好的上行数据包"""
+
+    # 轨迹文件的列名，time列可省略（此时按固定频率回放）
+    COLUMNS = ['time', 'switch', 'fan_rpm', 'servo1', 'servo2', 'servo3', 'servo4']
+
+    def __init__(self, protocol):
+        """初始化回放器
+        Args:
+            protocol: Protocol 协议处理器，用于批量编码上行数据包
+        """
+        self.protocol = protocol
+        # 提前唤醒后忙等的时间窗口，单位秒
+        self.spin_window = 0.002
+        # 开始回放前的准备时间，单位秒
+        self.lead_time = 0.05
+
+        # 轨迹数据
+        self.path = None
+        self.times = None
+        self.values = None
+        # 所有帧编码在同一段连续缓冲区中
+        self.buffer = b""
+        # 按帧切好的只读片段，发送循环中直接取用
+        self.frames = []
+        # 编码时协议的校验模式，与当前模式不一致时需要重新编码
+        self.crc_mode = None
+
+        # 回放结果：每帧相对计划时间的误差，单位秒
+        self.errors = None
+        self.sent_count = 0
+        # 写入串口失败（如串口已关闭）而中止回放时为True
+        self.write_failed = False
+
+        # 回放线程和运行标志
+        self.thread = None
+        self.playing = False
+
+    def load(self, path, rate=None):
+        """加载轨迹文件并预编码所有帧
+        Args:
+            path: str CSV或NPY文件路径
+            rate: float 回放频率(Hz)，仅在文件没有time列时使用
+        Returns:
+            bool: 加载是否成功
+        """
+        try:
+            table = self._read_table(path)
+            n = len(table['switch'])
+            if n == 0:
+                print("错误：轨迹文件中没有数据")
+                return False
+
+            if table.get('time') is not None:
+                times = np.asarray(table['time'], dtype=np.float64)
+                if np.any(np.diff(times) < 0):
+                    print("错误：time列必须单调不减")
+                    return False
+                times = times - times[0]
+            else:
+                rate = rate or self.protocol.send_frequency
+                times = np.arange(n, dtype=np.float64) / rate
+
+            switch = np.asarray(table['switch'], dtype=np.int64)
+            fan_rpm = np.asarray(table['fan_rpm'], dtype=np.float64)
+            servo = np.column_stack([table[f'servo{i}'] for i in range(1, 5)]).astype(np.float64)
+
+            values = np.column_stack([switch, fan_rpm, servo])
+            self._encode(values)
+        except Exception as e:
+            print(f"加载轨迹文件错误: {e}")
+            return False
+
+        self.path = path
+        self.times = times
+        self.values = values
+        self.errors = None
+        self.sent_count = 0
+        self.write_failed = False
+        return True
+
+    def _encode(self, values):
+        """按协议当前的校验模式把所有帧编码到连续缓冲区并切片"""
+        buffer = self.protocol.encode_up_frames(values[:, 0].astype(np.int64),
+                                                values[:, 1], values[:, 2:6])
+        size = self.protocol.UP_FRAME_SZ
+        self.buffer = buffer
+        self.frames = [buffer[i * size:(i + 1) * size] for i in range(len(values))]
+        self.crc_mode = self.protocol.crc_mode
+
+    def reencode(self):
+        """
+        协议校验模式改变后重新编码已加载的轨迹（帧长度随之改变）
+        Returns:
+            bool: 是否进行了重新编码
+        """
+        if self.values is None or self.crc_mode == self.protocol.crc_mode:
+            return False
+        if self.playing:
+            raise RuntimeError("轨迹回放正在运行，不能重新编码")
+        self._encode(self.values)
+        return True
+
+    def _read_table(self, path):
+        """读取轨迹文件，返回 列名 -> 一维数组 的字典"""
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.npy':
+            data = np.load(path, allow_pickle=False)
+            if data.dtype.names:
+                # 结构化数组，按字段名取列
+                names = data.dtype.names
+                columns = {name: data[name] for name in names}
+            else:
+                # 普通二维数组：7列含time，6列不含time
+                data = np.atleast_2d(data)
+                if data.shape[1] == len(self.COLUMNS):
+                    names = self.COLUMNS
+                elif data.shape[1] == len(self.COLUMNS) - 1:
+                    names = self.COLUMNS[1:]
+                else:
+                    raise ValueError(f"NPY数组应为6或7列，实际为{data.shape[1]}列")
+                columns = {name: data[:, i] for i, name in enumerate(names)}
+        else:
+            # CSV文件，第一行为列名
+            with open(path, 'r', encoding='utf-8') as f:
+                header = f.readline()
+            names = [name.strip().lower() for name in header.split(',')]
+            data = np.loadtxt(path, delimiter=',', skiprows=1, ndmin=2)
+            if data.shape[1] != len(names):
+                raise ValueError("CSV列数与表头不一致")
+            columns = {name: data[:, i] for i, name in enumerate(names)}
+
+        missing = [name for name in self.COLUMNS[1:] if name not in columns]
+        if missing:
+            raise ValueError(f"缺少列: {', '.join(missing)}")
+        return columns
+
+    def start(self, write, on_finish=None):
+        """在后台线程中开始回放
+        Args:
+            write: callable 发送单帧的函数，接收bytes，返回False表示写入失败
+            on_finish: callable 回放结束后调用（无论是否被中止）
+        Returns:
+            bool: 是否成功启动
+        """
+        if not self.frames:
+            print("错误：尚未加载轨迹")
+            return False
+        if self.playing:
+            print("轨迹回放已在运行")
+            return False
+        # 加载后校验模式被修改过，按新模式重新编码
+        self.reencode()
+
+        self.playing = True
+        self.thread = threading.Thread(
+            target=self._play_worker,
+            args=(write, on_finish),
+            daemon=True
+        )
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """中止回放"""
+        self.playing = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2.0)
+
+    def _play_worker(self, write, on_finish):
+        """回放工作线程：按截止时间发送，循环内不做编码和内存分配"""
+        frames = self.frames
+        times = self.times
+        n = len(frames)
+        errors = np.zeros(n, dtype=np.float64)
+        spin_window = self.spin_window
+        perf_counter = time.perf_counter
+        sleep = time.sleep
+
+        start = perf_counter() + self.lead_time
+        sent = 0
+        failed = False
+        for i in range(n):
+            if not self.playing:
+                break
+            deadline = start + times[i]
+            # 先粗略休眠，剩余时间忙等到截止时刻
+            remaining = deadline - perf_counter()
+            if remaining > spin_window:
+                sleep(remaining - spin_window)
+            while perf_counter() < deadline:
+                pass
+            if not write(frames[i]):
+                # 写入失败的帧不计为已发送，串口已不可用，中止回放
+                failed = True
+                break
+            errors[i] = perf_counter() - deadline
+            sent += 1
+
+        self.errors = errors[:sent]
+        self.sent_count = sent
+        self.write_failed = failed
+        self.playing = False
+        if failed:
+            print(f"轨迹回放中止：第{sent + 1}帧写入串口失败")
+        if on_finish:
+            try:
+                on_finish()
+            except Exception as e:
+                print(f"回放结束回调执行错误: {e}")
+
+    def last_values(self):
+        """返回最后一帧已发送数据的 (开关, 风扇转速, 舵机角度列表)，未发送时返回None"""
+        if not self.sent_count:
+            return None
+        row = self.values[self.sent_count - 1]
+        return int(row[0]), float(row[1]), [float(x) for x in row[2:6]]
+
+    def print_report(self):
+        """打印回放时序误差统计"""
+        if self.errors is None or len(self.errors) == 0:
+            print("尚无回放结果")
+            return
+        errors_ms = self.errors * 1000.0
+        abs_ms = np.abs(errors_ms)
+        print("\n轨迹回放报告:")
+        print(f"  轨迹文件: {self.path}")
+        print(f"  已发送帧: {self.sent_count}/{len(self.frames)}"
+              + ("（写入串口失败，回放中止）" if self.write_failed else ""))
+        print(f"  计划时长: {self.times[self.sent_count - 1]:.3f}秒")
+        print(f"  时序误差: 平均 {errors_ms.mean():.3f}ms, 标准差 {errors_ms.std():.3f}ms")
+        print(f"           P50 {np.percentile(abs_ms, 50):.3f}ms, "
+              f"P99 {np.percentile(abs_ms, 99):.3f}ms, 最大 {abs_ms.max():.3f}ms")
+        print(f"  误差超过1ms的帧: {int(np.count_nonzero(abs_ms > 1.0))}个")
+
+    def save_report(self, path):
+        """将逐帧时序误差保存为CSV（帧序号, 计划时间, 误差）"""
+        if self.errors is None:
+            print("尚无回放结果")
+            return False
+        try:
+            n = len(self.errors)
+            table = np.column_stack([np.arange(n), self.times[:n], self.errors])
+            np.savetxt(path, table, delimiter=',', fmt=['%d', '%.6f', '%.9f'],
+                       header='frame,scheduled,error', comments='')
+            print(f"逐帧时序误差已保存到 {path}")
+            return True
+        except Exception as e:
+            print(f"保存回放报告错误: {e}")
+            return False
@@ -0,0 +1,104 @@
+"""遥测归档的写入、时间窗口查询与索引恢复测试"""
+import numpy as np
+import pytest
+
+from archive import TelemetryArchiveWriter, TelemetryArchiveReader, FOOTER, CHUNK_HEADER, GYRO_COUNT
+
+
+def make_telemetry(n, seed=0):
+    """生成n帧遥测数据：1kHz时间戳，last_switch + 9列传感器值"""
+    rng = np.random.default_rng(seed)
+    t = 1.7e9 + np.arange(n) * 0.001
+    values = np.empty((n, 1 + GYRO_COUNT))
+    values[:, 0] = rng.integers(0, 3, size=n)
+    values[:, 1:] = rng.normal(0.0, 100.0, size=(n, GYRO_COUNT)).astype(np.float32)
+    return t, values
+
+
+def write_archive(path, t, values, codec='zlib', batch=100, **kwargs):
+    """按串口读取的方式分批写入，返回关闭后的写入器"""
+    writer = TelemetryArchiveWriter(str(path), codec=codec, **kwargs)
+    for i in range(0, len(t), batch):
+        writer.write(t[i:i + batch], values[i:i + batch])
+    writer.close()
+    return writer
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'lzma'])
+def test_round_trip(tmp_path, codec):
+    """全部读出的数据与写入的逐帧相同"""
+    t, values = make_telemetry(10000)
+    path = tmp_path / 'session.tla'
+    writer = write_archive(path, t, values, codec=codec, chunk_frames=1000)
+
+    reader = TelemetryArchiveReader(str(path))
+    try:
+        assert not reader.recovered
+        assert len(reader.index) == writer.stats()[1] == 10
+        assert reader.time_range() == (t[0], t[-1])
+        rt, switch, gyro = reader.read()
+    finally:
+        reader.close()
+    np.testing.assert_array_equal(rt, t)
+    np.testing.assert_array_equal(switch, values[:, 0].astype(np.uint8))
+    np.testing.assert_array_equal(gyro, values[:, 1:].astype(np.float32))
+
+
+def test_window_query(tmp_path):
+    """时间窗口查询只返回窗口内的帧（含两端），与直接筛选的结果相同"""
+    t, values = make_telemetry(10000, seed=1)
+    path = tmp_path / 'session.tla'
+    write_archive(path, t, values, chunk_frames=1000)
+
+    reader = TelemetryArchiveReader(str(path))
+    try:
+        for t0, t1 in [(t[1500], t[4321]), (t[0], t[0]), (t[-1] - 0.5, None), (None, t[999])]:
+            rt, switch, gyro = reader.read(t0, t1)
+            mask = np.ones(len(t), dtype=bool)
+            if t0 is not None:
+                mask &= t >= t0
+            if t1 is not None:
+                mask &= t <= t1
+            np.testing.assert_array_equal(rt, t[mask])
+            np.testing.assert_array_equal(gyro, values[mask, 1:].astype(np.float32))
+
+        rt, switch, gyro = reader.read(t[-1] + 1.0, t[-1] + 2.0)
+        assert len(rt) == len(switch) == len(gyro) == 0
+    finally:
+        reader.close()
+
+
+def test_truncated_file_recovery(tmp_path):
+    """缺少尾部索引或最后一块不完整时逐块扫描恢复，完整的数据块全部可读"""
+    t, values = make_telemetry(5000, seed=2)
+    path = tmp_path / 'session.tla'
+    writer = write_archive(path, t, values, chunk_frames=1000)
+    last_offset = writer.index[-1][2]
+
+    data = path.read_bytes()
+    index_offset = FOOTER.unpack(data[-FOOTER.size:])[0]
+
+    # 去掉尾部索引：5个数据块完整
+    no_footer = tmp_path / 'no_footer.tla'
+    no_footer.write_bytes(data[:index_offset])
+    reader = TelemetryArchiveReader(str(no_footer))
+    try:
+        assert reader.recovered
+        assert len(reader.index) == 5
+        rt, _, gyro = reader.read()
+    finally:
+        reader.close()
+    np.testing.assert_array_equal(rt, t)
+    np.testing.assert_array_equal(gyro, values[:, 1:].astype(np.float32))
+
+    # 最后一个数据块写到一半：只恢复前4块
+    partial = tmp_path / 'partial.tla'
+    partial.write_bytes(data[:last_offset + CHUNK_HEADER.size + 10])
+    reader = TelemetryArchiveReader(str(partial))
+    try:
+        assert reader.recovered
+        assert len(reader.index) == 4
+        rt, _, _ = reader.read()
+    finally:
+        reader.close()
+    np.testing.assert_array_equal(rt, t[:4000])
@@ -0,0 +1,38 @@
+"""LTTB降采样选点测试"""
+import numpy as np
+
+from decimation import lttb_indices
+
+
+def test_keeps_endpoints_and_count():
+    rng = np.random.default_rng(0)
+    t = np.arange(1000, dtype=np.float64)
+    y = rng.normal(size=1000)
+    for n_out in (3, 10, 50, 999):
+        index = lttb_indices(t, y, n_out)
+        assert len(index) == n_out
+        assert index[0] == 0 and index[-1] == 999
+        assert np.all(np.diff(index) > 0)
+
+
+def test_returns_all_points_when_not_reducing():
+    t = np.arange(20, dtype=np.float64)
+    y = np.sin(t)
+    np.testing.assert_array_equal(lttb_indices(t, y, 20), np.arange(20))
+    np.testing.assert_array_equal(lttb_indices(t, y, 100), np.arange(20))
+
+
+def test_few_points_keeps_endpoints():
+    t = np.arange(10, dtype=np.float64)
+    np.testing.assert_array_equal(lttb_indices(t, t, 2), [0, 9])
+
+
+def test_picks_spike():
+    """平坦数据中的单个尖峰一定被选中"""
+    t = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[437] = 50.0
+    y[812] = -30.0
+    index = lttb_indices(t, y, 20)
+    assert 437 in index
+    assert 812 in index
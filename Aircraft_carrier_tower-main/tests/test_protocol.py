@@ -0,0 +1,81 @@
+"""协议编解码与校验的一致性测试"""
+import numpy as np
+import pytest
+
+from crc import crc8, crc16, crc8_rows, crc16_rows
+from protocol import Protocol
+from bench_protocol import build_stream
+
+CRC_MODES = [None, 'crc8', 'crc16']
+
+
+def make_protocol(mode):
+    protocol = Protocol()
+    protocol.set_crc_mode(mode)
+    return protocol
+
+
+def test_crc_check_values():
+    """标准校验值："123456789"的CRC-8/MAXIM为0xA1，CRC-16/CCITT-FALSE为0x29B1"""
+    assert crc8(b"123456789") == 0xA1
+    assert crc16(b"123456789") == 0x29B1
+
+
+def test_crc_rows_match_scalar():
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, 256, size=(200, 13), dtype=np.uint8)
+    assert crc8_rows(rows).tolist() == [crc8(row.tobytes()) for row in rows]
+    assert crc16_rows(rows).tolist() == [crc16(row.tobytes()) for row in rows]
+
+
+@pytest.mark.parametrize('mode', CRC_MODES)
+def test_encode_up_frames_matches_single(mode):
+    """批量编码与逐帧编码逐字节相同"""
+    protocol = make_protocol(mode)
+    rng = np.random.default_rng(1)
+    n = 500
+    switch = rng.integers(0, 3, size=n)
+    fan = rng.uniform(-1000.0, 1000.0, size=n)
+    servo = rng.uniform(-180.0, 180.0, size=(n, 4))
+
+    batch = protocol.encode_up_frames(switch, fan, servo)
+    single = b''.join(protocol.encode_up_frame(int(switch[i]), fan[i], servo[i].tolist())
+                      for i in range(n))
+    assert len(batch) == n * protocol.UP_FRAME_SZ
+    assert batch == single
+
+
+@pytest.mark.parametrize('mode', CRC_MODES)
+def test_decode_down_frames_matches_streaming(mode):
+    """带噪声的数据流：批量解码与按随机分块的流式解码结果相同"""
+    protocol = make_protocol(mode)
+    stream, _ = build_stream(protocol, 3000, drop=0.03, flip=0.03, garbage=0.03, seed=2)
+
+    rng = np.random.default_rng(3)
+    packets = []
+    pos = 0
+    while pos < len(stream):
+        size = int(rng.integers(1, 300))
+        packets.extend(protocol.process_receive_data(stream[pos:pos + size]))
+        pos += size
+    streamed = protocol.packets_to_array(packets)
+
+    frames, starts = make_protocol(mode).decode_down_frames(stream)
+    with np.errstate(invalid='ignore'):
+        batch = np.column_stack([frames['last_switch'], frames['gyro'].astype(np.float64)])
+
+    assert len(frames) == len(streamed) > 0
+    assert np.all(np.diff(starts) >= protocol.DOWN_FRAME_SZ)
+    assert np.array_equal(batch, streamed, equal_nan=True)
+
+
+@pytest.mark.parametrize('mode', ['crc8', 'crc16'])
+def test_crc_rejects_corrupted_frames(mode):
+    """启用校验后，比特翻转的数据帧全部被拒绝"""
+    protocol = make_protocol(mode)
+    stream, originals = build_stream(protocol, 2000, drop=0.0, flip=0.2, garbage=0.0, seed=4)
+    frames, _ = protocol.decode_down_frames(stream)
+    for frame in frames:
+        body = frame.tobytes()[:protocol.DOWN_BASE_SZ]
+        assert originals[int(frame['gyro'][0])] == body
+    assert protocol.crc_errors > 0
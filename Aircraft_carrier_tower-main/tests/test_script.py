@@ -0,0 +1,80 @@
+"""测试脚本解析：计划时间、repeat展开与语法错误"""
+import pytest
+
+from script import parse_script, ScriptError
+
+COMMANDS = {'switch', 'fan', 'servo', 'reliable'}
+
+
+def parse(text, commands=COMMANDS):
+    return parse_script(text.strip().splitlines(), commands)
+
+
+def test_schedule_and_comments():
+    steps = parse("""
+        # 注释行
+        switch 1
+        wait 0.5
+        fan 100   # 行尾注释
+        at 2
+        switch 0
+    """)
+    assert [(s.kind, s.text, s.scheduled) for s in steps] == [
+        ('command', 'switch 1', 0.0),
+        ('command', 'fan 100', 0.5),
+        ('command', 'switch 0', 2.0),
+    ]
+    assert [s.lineno for s in steps] == [2, 4, 6]
+
+
+def test_repeat_expansion():
+    """repeat可嵌套，展开后计划时间依次累加"""
+    steps = parse("""
+        repeat 2
+            switch 1
+            wait 1
+            repeat 2
+                fan 10
+                wait 0.25
+            end
+        end
+        switch 0
+    """)
+    assert [(s.text, s.scheduled) for s in steps] == [
+        ('switch 1', 0.0), ('fan 10', 1.0), ('fan 10', 1.25),
+        ('switch 1', 1.5), ('fan 10', 2.5), ('fan 10', 2.75),
+        ('switch 0', 3.0),
+    ]
+
+
+def test_assert_parsing():
+    steps = parse("""
+        switch 1
+        assert last_switch == 1 within 0.5
+        assert gz < -3.5
+    """)
+    assert steps[1].kind == 'assert'
+    assert steps[1].payload == ('last_switch', '==', 1.0, 0.5)
+    assert steps[2].payload == ('gz', '<', -3.5, 0.0)
+
+
+@pytest.mark.parametrize('text, lineno', [
+    ("wait 2\nat 1", 2),                        # at早于当前计划时间
+    ("repeat 2\nat 1\nend", 2),                  # repeat块内不能使用at
+    ("switch 1\nlaunch", 2),                    # 未知命令
+    ("repeat 2\nswitch 1", 2),                  # 缺少end
+    ("end", 1),                                 # 多余的end
+    ("wait -1", 1),                             # 负数时间
+    ("repeat x\nend", 1),                       # 次数不是整数
+    ("assert gx ~ 1", 1),                       # 不支持的运算
+    ("assert gx == abc", 1),                    # 比较值不是数字
+])
+def test_errors(text, lineno):
+    with pytest.raises(ScriptError) as info:
+        parse(text)
+    assert info.value.lineno == lineno
+
+
+def test_commands_not_checked_without_set():
+    steps = parse("launch now", commands=None)
+    assert [s.text for s in steps] == ['launch now']